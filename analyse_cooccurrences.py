@@ -9,64 +9,61 @@
 # Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
 ##########################################
 
+import hashlib
+from collections import Counter
+import numpy as np
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-from collections import Counter
 import nltk
 from nltk.corpus import stopwords as nltk_stopwords
-from nltk.tokenize import word_tokenize
 from wordcloud import WordCloud
 import os
+from corpus import lire_corpus
+from scipy import sparse
+from associations import MESURES, associations_matrice, associations_mots_cles
+from index_positionnel import charger_index, matrice_cooccurrences
 
 # Charger les ressources NLTK
-nltk.download('punkt')
-nltk.download('punkt_tab') # ????? pas certain
 nltk.download('stopwords')
 
+# Modes d'analyse
+MODE_MOTS_CLES = "Cooccurrents de mots-clés"
+MODE_MATRICE = "Matrice complète des cooccurrences"
+
+# Critères de classement des cooccurrents : fréquence brute ou mesure d'association
+FREQUENCE = "Frequency"
+CRITERES = [FREQUENCE] + MESURES
+
 # Variables globales
-french_stopwords = set(nltk_stopwords.words('french'))
-french_stopwords.update(["encore", "plus", "cela", "entre", "si", "très", "comme"])  # Stopwords supplémentaires
-
-
-# Fonction pour prétraiter le texte
-def preprocess_text(doc):
-    tokens = word_tokenize(doc, language='french')
-    filtered_tokens = [token.lower() for token in tokens if
-                       token.lower().isalnum() and token.lower() not in french_stopwords]
-    return filtered_tokens
-
-
-# Fonction pour lire et prétraiter le fichier
-def read_and_preprocess_file(file_content):
-    articles = []
-    current_article = []
-    for line in file_content.splitlines():
-        if line.startswith('****'):
-            if current_article:
-                articles.append(' '.join(current_article).strip())
-                current_article = []
-        else:
-            current_article.append(line)
-    if current_article:
-        articles.append(' '.join(current_article).strip())
-    return articles
-
-
-# Fonction pour calculer les cooccurrences
-def calculate_cooccurrences(articles, keyword, window_size=10):
-    cooccurrence_counter = Counter()
-    for article in articles:
-        tokens = preprocess_text(article)
-        keyword_indices = [i for i, token in enumerate(tokens) if token == keyword]
-        for index in keyword_indices:
-            window_start = max(0, index - window_size)
-            window_end = min(len(tokens), index + window_size + 1)
-            context_tokens = tokens[window_start:index] + tokens[index + 1:window_end]
-            for token in context_tokens:
-                if token != keyword:
-                    cooccurrence_counter[token] += 1
-    return cooccurrence_counter
+french_stopwords = frozenset(nltk_stopwords.words('french')).union(
+    ["encore", "plus", "cela", "entre", "si", "très", "comme"])  # Stopwords supplémentaires
+
+
+# Fonction pour lire le fichier article par article
+def read_and_preprocess_file(source):
+    for article in lire_corpus(source):
+        yield article['texte'].strip()
+
+
+# Fonction pour obtenir l'index positionnel du corpus (construit une seule fois par fichier et par mots exclus)
+def indexer_corpus(source, empreinte, stopwords):
+    return charger_index(read_and_preprocess_file(source), empreinte, stopwords)
+
+
+# Fonction pour obtenir les cooccurrents classés selon un critère sous forme de Counter (terme -> valeur)
+# Seules les valeurs positives et finies sont gardées (le nuage de mots n'accepte que des poids positifs)
+def calculate_cooccurrences(associations, critere=FREQUENCE):
+    valeurs = associations[critere].to_numpy()
+    gardes = np.isfinite(valeurs) & (valeurs > 0)
+    return Counter(dict(zip(associations['Cooccurrence'][gardes].tolist(), valeurs[gardes].tolist())))
+
+
+# Fonction pour générer un fichier CSV des comptes bruts et des mesures d'association des cooccurrents
+def generate_associations_csv(associations, output_directory, keyword, critere=FREQUENCE):
+    csv_path = os.path.join(output_directory, f"associations_{keyword}.csv")
+    associations.sort_values(critere, ascending=False, kind='stable').to_csv(csv_path, index=False)
+    return csv_path
 
 
 # Fonction pour générer un fichier CSV des cooccurrences
@@ -91,52 +88,116 @@ def generate_wordcloud(cooccurrences, output_directory, keyword, top_n):
     return plt_path
 
 
+# Fonction pour enregistrer la matrice des cooccurrences : matrice creuse (.npz), termes de ses lignes et colonnes
+# et liste d'arêtes (une ligne par paire de termes, chaque paire une seule fois, avec ses mesures d'association)
+def generate_matrix_files(matrice, termes, output_directory, window_size, critere=FREQUENCE):
+    nom = f"cooccurrences_matrice_{len(termes)}_fenetre{window_size}"
+    npz_path = os.path.join(output_directory, f"{nom}.npz")
+    sparse.save_npz(npz_path, matrice)
+    pd.DataFrame({'Terme': termes}).to_csv(os.path.join(output_directory, f"{nom}_termes.csv"), index_label='Indice')
+
+    edges = associations_matrice(matrice, termes)
+    edges = edges.sort_values('Weight' if critere == FREQUENCE else critere, ascending=False, kind='stable')
+    edges_path = os.path.join(output_directory, f"{nom}_aretes.csv")
+    edges.to_csv(edges_path, index=False)
+    return npz_path, edges_path, edges
+
+
+# Fonction pour analyser les cooccurrents d'un ou plusieurs mots-clés
+def analyse_mots_cles(uploaded_file, stopwords, window_size, critere):
+    keywords_str = st.text_input("Entrez le ou les mots-clés pour l'analyse (séparés par une virgule):")
+    top_n_cooccurrences = st.number_input("Nombre de co-occurrences à afficher:", min_value=1, max_value=100,
+                                          value=10)
+
+    keywords = [word.strip().lower() for word in keywords_str.split(',') if word.strip()]
+    if keywords:
+        keyword = "_".join(keywords)
+        output_directory = st.text_input("Définir le répertoire de sauvegarde",
+                                         value=os.path.expanduser("~/Documents/ATA/Cooccurrences"))
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+
+        if st.button("Lancer l'Analyse"):
+            empreinte_fichier = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+            index = indexer_corpus(uploaded_file, empreinte_fichier, stopwords)
+            associations = associations_mots_cles(index, keywords, window_size)
+
+            if len(associations):
+                st.success("Analyse terminée avec succès.")
+                csv_path = generate_csv(calculate_cooccurrences(associations), output_directory, keyword)
+                st.write(f"Les co-occurrences ont été sauvegardées dans {csv_path}")
+                associations_path = generate_associations_csv(associations, output_directory, keyword, critere)
+                st.write(f"Les mesures d'association ont été sauvegardées dans {associations_path}")
+
+                cooccurrences = calculate_cooccurrences(associations, critere)
+
+                wordcloud_path = generate_wordcloud(cooccurrences, output_directory, keyword, top_n_cooccurrences)
+                st.write(f"Nuage de mots sauvegardé dans {wordcloud_path}")
+            else:
+                st.error("Aucune co-occurrence trouvée pour ce mot-clé.")
+
+
+# Fonction pour calculer la matrice terme × terme des cooccurrences du vocabulaire le plus fréquent
+def analyse_matrice(uploaded_file, stopwords, window_size, critere):
+    top_n_termes = st.number_input("Nombre de termes (les plus fréquents) dans la matrice:", min_value=10,
+                                   max_value=50000, value=1000, step=100)
+    output_directory = st.text_input("Définir le répertoire de sauvegarde",
+                                     value=os.path.expanduser("~/Documents/ATA/Cooccurrences"))
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+
+    if st.button("Calculer la matrice"):
+        empreinte_fichier = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        index = indexer_corpus(uploaded_file, empreinte_fichier, stopwords)
+        matrice, identifiants = matrice_cooccurrences(index, int(top_n_termes), window_size)
+        termes = index['vocabulaire'][identifiants]
+
+        if matrice.nnz:
+            npz_path, edges_path, edges = generate_matrix_files(matrice, termes, output_directory, window_size,
+                                                                critere)
+            st.success(f"Matrice {len(termes)} × {len(termes)} calculée : {len(edges)} paires de termes cooccurrents "
+                       f"sur {len(index['tokens'])} tokens.")
+            st.write(f"Matrice creuse sauvegardée dans {npz_path}")
+            st.write(f"Liste d'arêtes sauvegardée dans {edges_path}")
+            st.dataframe(edges.head(100), use_container_width=True)
+        else:
+            st.error("Aucune co-occurrence trouvée dans le corpus.")
+
+
 # Fonction pour afficher l'interface utilisateur
 def afficher_interface_cooccurrences():
-    st.title("Analyse de Cooccurrences à partir d'un mot-clé")
+    st.title("Analyse de Cooccurrences à partir de mots-clés")
 
     # Explications sur le fonctionnement du script
     st.markdown("""
-    - Ce script permet d'analyser les cooccurrences d'un mot-clé spécifique dans un fichier texte.
+    - Ce script permet d'analyser les cooccurrences d'un ou plusieurs mots-clés (séparés par une virgule) dans un fichier texte.
+    - Le corpus est indexé une seule fois : changer de mot-clé ou de fenêtre ne relit pas le fichier.
     - Assurez-vous que le fichier texte est correctement formaté avec chaque article commençant par '****'.
     - Vous pouvez entrer des mots à exclure supplémentaires dans le champ dédié.
     - Sélectionnez le nombre de cooccurrences à afficher et lancez l'analyse.
     - Le script génère un fichier CSV des cooccurrences et un nuage de mots.
+    - Les cooccurrents peuvent être classés par fréquence brute ou par mesure d'association (log-vraisemblance,
+      PMI, PPMI, chi², spécificité hypergéométrique) ; les mesures sont exportées avec les comptes bruts.
+    - Le mode « matrice complète » calcule les cooccurrences entre tous les termes les plus fréquents et les enregistre
+      en matrice creuse (.npz) et en liste d'arêtes (CSV Source, Target, Weight) pour l'analyse de graphe.
     """)
 
     uploaded_file = st.file_uploader("Téléchargez un fichier texte", type="txt")
 
     if uploaded_file is not None:
-        file_content = uploaded_file.getvalue().decode("utf-8")
-
-        keyword = st.text_input("Entrez le mot-clé pour l'analyse:")
+        mode = st.radio("Mode d'analyse", [MODE_MOTS_CLES, MODE_MATRICE])
         stopwords_str = st.text_area("Entrez des mots à exclure supplémentaires (séparés par une virgule):", value="")
-        if stopwords_str:
-            custom_stopwords = [word.strip().lower() for word in stopwords_str.split(',')]
-            french_stopwords.update(custom_stopwords)
-
-        top_n_cooccurrences = st.number_input("Nombre de co-occurrences à afficher:", min_value=1, max_value=100,
-                                              value=10)
-
-        if keyword:
-            output_directory = st.text_input("Définir le répertoire de sauvegarde",
-                                             value=os.path.expanduser("~/Documents/ATA/Cooccurrences"))
-            if not os.path.exists(output_directory):
-                os.makedirs(output_directory)
-
-            if st.button("Lancer l'Analyse"):
-                articles = read_and_preprocess_file(file_content)
-                cooccurrences = calculate_cooccurrences(articles, keyword)
-
-                if cooccurrences:
-                    st.success("Analyse terminée avec succès.")
-                    csv_path = generate_csv(cooccurrences, output_directory, keyword)
-                    st.write(f"Les co-occurrences ont été sauvegardées dans {csv_path}")
-
-                    wordcloud_path = generate_wordcloud(cooccurrences, output_directory, keyword, top_n_cooccurrences)
-                    st.write(f"Nuage de mots sauvegardé dans {wordcloud_path}")
-                else:
-                    st.error("Aucune co-occurrence trouvée pour ce mot-clé.")
+        stopwords = french_stopwords | {word.strip().lower() for word in stopwords_str.split(',') if word.strip()}
+
+        window_size = st.slider("Taille de la fenêtre (mots de part et d'autre du mot-clé):", min_value=1,
+                                max_value=50, value=10)
+
+        critere = st.selectbox("Classer les cooccurrents par:", CRITERES)
+
+        if mode == MODE_MATRICE:
+            analyse_matrice(uploaded_file, stopwords, window_size, critere)
+        else:
+            analyse_mots_cles(uploaded_file, stopwords, window_size, critere)
 
 
 # Lancer l'application Streamlit
@@ -0,0 +1,181 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import os
+from collections import deque
+from itertools import chain
+import numpy as np
+import spacy
+import streamlit as st
+from cache_disque import (NOMBRE_PROCESSUS_MAX, repertoire_cache, hacher_texte, encoder_chaines, decoder_chaines,
+                          ecrire_atomique)
+from ressources_nlp import COMPOSANTS_LEMMES, MODELE_SPACY
+
+# Paramètres par défaut de l'annotation par lots
+TAILLE_LOT_PAR_DEFAUT = 64
+
+# Étiquettes POS universelles, stockées sous forme de codes uint8 dans le cache
+ETIQUETTES_POS = ["", "ADJ", "ADP", "ADV", "AUX", "CONJ", "CCONJ", "DET", "INTJ", "NOUN", "NUM", "PART", "PRON",
+                  "PROPN", "PUNCT", "SCONJ", "SYM", "VERB", "X", "EOL", "SPACE"]
+CODES_POS = {etiquette: code for code, etiquette in enumerate(ETIQUETTES_POS)}
+
+
+# Fonction pour lister les composants du pipeline à désactiver pour un besoin donné
+def composants_inutiles(nlp, composants=COMPOSANTS_LEMMES):
+    return [nom for nom in nlp.pipe_names if nom not in composants]
+
+
+# Fonction pour annoter un flux de textes par lots avec nlp.pipe
+# Les documents sont produits dans l'ordre des textes ; la progression est signalée à chaque lot
+def annoter_textes(textes, nlp, batch_size=TAILLE_LOT_PAR_DEFAUT, n_process=1, composants=COMPOSANTS_LEMMES,
+                   progression=None, as_tuples=False):
+    desactives = composants_inutiles(nlp, composants)
+    nombre_docs = 0
+    for doc in nlp.pipe(textes, batch_size=batch_size, n_process=n_process, disable=desactives,
+                        as_tuples=as_tuples):
+        nombre_docs += 1
+        if progression is not None and nombre_docs % batch_size == 0:
+            progression(nombre_docs)
+        yield doc
+    if progression is not None:
+        progression(nombre_docs)
+
+
+# Fonction pour identifier le modèle et les composants utilisés (clé du cache d'annotations)
+def version_pipeline(modele=MODELE_SPACY, composants=COMPOSANTS_LEMMES):
+    version_modele = spacy.util.get_package_version(modele) or "local"
+    return f"{modele}-{version_modele}_spacy-{spacy.__version__}_{'-'.join(composants)}"
+
+
+# Fonction pour convertir un document SpaCy en annotation compacte (tableaux par colonne)
+def annotation_depuis_doc(doc):
+    formes, bornes_formes = encoder_chaines([token.text for token in doc])
+    lemmes, bornes_lemmes = encoder_chaines([token.lemma_ for token in doc])
+    return {
+        'formes': formes,
+        'bornes_formes': bornes_formes,
+        'lemmes': lemmes,
+        'bornes_lemmes': bornes_lemmes,
+        'pos': np.array([CODES_POS.get(token.pos_, 0) for token in doc], dtype=np.uint8),
+        'is_stop': np.array([token.is_stop for token in doc], dtype=bool),
+        'is_alpha': np.array([token.is_alpha for token in doc], dtype=bool),
+        'is_punct': np.array([token.is_punct for token in doc], dtype=bool),
+    }
+
+
+# Fonction pour obtenir les codes des étiquettes POS à exclure
+def codes_pos(etiquettes):
+    return np.array([CODES_POS[etiquette] for etiquette in etiquettes if etiquette in CODES_POS], dtype=np.uint8)
+
+
+# Fonction pour obtenir les formes des tokens sélectionnés d'une annotation
+def formes_tokens(annotation, indices):
+    return decoder_chaines(annotation['formes'], annotation['bornes_formes'], indices)
+
+
+# Fonction pour obtenir les lemmes des tokens sélectionnés d'une annotation
+def lemmes_tokens(annotation, indices):
+    return decoder_chaines(annotation['lemmes'], annotation['bornes_lemmes'], indices)
+
+
+# Fonction pour obtenir le chemin d'une annotation dans le cache à partir de l'empreinte de l'article
+def chemin_annotation(repertoire, empreinte):
+    sous_repertoire = os.path.join(repertoire, empreinte[:2])
+    os.makedirs(sous_repertoire, exist_ok=True)
+    return os.path.join(sous_repertoire, f"{empreinte}.npz")
+
+
+# Fonction pour enregistrer une annotation (écriture atomique)
+def enregistrer_annotation(annotation, chemin):
+    ecrire_atomique(chemin, lambda fichier: np.savez(fichier, **annotation))
+
+
+# Fonction pour relire une annotation du cache
+def charger_annotation(chemin):
+    with np.load(chemin) as donnees:
+        return {cle: donnees[cle] for cle in donnees.files}
+
+
+# Fonction pour annoter un flux de textes en réutilisant le cache disque
+# SpaCy (et le chargement du modèle) n'est sollicité que pour les articles absents du cache
+def annoter_avec_cache(textes, chargeur_nlp, batch_size=TAILLE_LOT_PAR_DEFAUT, n_process=1,
+                       composants=COMPOSANTS_LEMMES, progression=None):
+    repertoire = repertoire_cache('annotations', version_pipeline(composants=composants))
+    ordre = deque()  # chemin de l'annotation en cache, ou None si l'article part dans SpaCy
+
+    def textes_manquants():
+        for texte in textes:
+            chemin = chemin_annotation(repertoire, hacher_texte(texte))
+            if os.path.exists(chemin):
+                ordre.append(chemin)
+            else:
+                ordre.append(None)
+                yield texte, chemin
+
+    manquants = textes_manquants()
+    premier = next(manquants, None)
+    docs = iter(())
+    if premier is not None:
+        docs = annoter_textes(chain([premier], manquants), chargeur_nlp(), batch_size=batch_size,
+                              n_process=n_process, composants=composants, as_tuples=True)
+
+    en_attente = deque()
+    fini = False
+    nombre_docs = 0
+    while True:
+        if not ordre:
+            if fini:
+                break
+            # Faire avancer la lecture des textes pour connaître les articles suivants
+            try:
+                en_attente.append(next(docs))
+            except StopIteration:
+                fini = True
+            continue
+
+        chemin = ordre.popleft()
+        if chemin is None:
+            doc, chemin = en_attente.popleft() if en_attente else next(docs)
+            annotation = annotation_depuis_doc(doc)
+            enregistrer_annotation(annotation, chemin)
+        else:
+            annotation = charger_annotation(chemin)
+
+        nombre_docs += 1
+        if progression is not None and nombre_docs % batch_size == 0:
+            progression(nombre_docs)
+        yield annotation
+
+    if progression is not None:
+        progression(nombre_docs)
+
+
+# Fonction pour créer une fonction de progression Streamlit (barre si le total est connu, texte sinon)
+def progression_streamlit(total=None, libelle="Articles annotés"):
+    zone = st.empty()
+
+    def afficher(nombre_docs):
+        if total:
+            zone.progress(min(nombre_docs / total, 1.0), text=f"{libelle} : {nombre_docs}/{total}")
+        else:
+            zone.write(f"{libelle} : {nombre_docs}")
+
+    return afficher
+
+
+# Fonction pour afficher les paramètres de l'annotation par lots
+def parametres_annotation():
+    with st.expander("Paramètres de l'annotation SpaCy"):
+        batch_size = st.number_input("Taille des lots (batch_size)", min_value=1, max_value=10000,
+                                     value=TAILLE_LOT_PAR_DEFAUT, key="annotation_taille_lots")
+        n_process = st.number_input("Processus de l'annotation", min_value=1, max_value=NOMBRE_PROCESSUS_MAX, value=1,
+                                    key="annotation_processus")
+    return int(batch_size), int(n_process)
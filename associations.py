@@ -0,0 +1,163 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.special import gammaln, xlogy
+from index_positionnel import compter_cooccurrences, identifiants_termes
+
+# Mesures d'association (colonnes des exports)
+LOG_VRAISEMBLANCE = "Log-vraisemblance"
+PMI = "PMI"
+PPMI = "PPMI"
+CHI2 = "Chi2"
+SPECIFICITE = "Spécificité"
+MESURES = [LOG_VRAISEMBLANCE, PMI, PPMI, CHI2, SPECIFICITE]
+
+# Précision relative de la somme d'une queue hypergéométrique (la sommation d'une paire s'arrête en dessous)
+PRECISION_QUEUE = 1e-12
+
+
+# Fonction pour construire les tableaux de contingence 2 × 2 (un par paire, tous les arguments sont des tableaux)
+# k : cooccurrences observées, n : taille de l'échantillon (fenêtres du pivot), f : fréquence du cooccurrent,
+# N : taille de la population ; les cases sont ramenées à 0 quand des fenêtres qui se chevauchent comptent
+# un même token plusieurs fois
+def tableau_contingence(k, n, f, N):
+    a = np.asarray(k, dtype=np.float64)
+    b = np.maximum(n - a, 0)
+    c = np.maximum(f - a, 0)
+    d = np.maximum(N - a - b - c, 0)
+    return a, b, c, d
+
+
+# Fonction pour calculer le rapport de log-vraisemblance G² de Dunning
+def log_vraisemblance(k, n, f, N):
+    a, b, c, d = tableau_contingence(k, n, f, N)
+    total = a + b + c + d
+    g2 = np.zeros_like(a)
+    for observe, ligne, colonne in ((a, a + b, a + c), (b, a + b, b + d), (c, c + d, a + c), (d, c + d, b + d)):
+        attendu = ligne * colonne / np.maximum(total, 1)
+        g2 += xlogy(observe, observe / np.where(attendu > 0, attendu, 1))
+    return 2 * g2
+
+
+# Fonction pour calculer l'information mutuelle ponctuelle (log2 ; -inf pour une paire jamais observée)
+def information_mutuelle(k, n, f, N):
+    k = np.asarray(k, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.log2(k * N / (np.asarray(n, dtype=np.float64) * f))
+
+
+# Fonction pour calculer l'information mutuelle ponctuelle positive
+def information_mutuelle_positive(k, n, f, N):
+    return np.maximum(information_mutuelle(k, n, f, N), 0)
+
+
+# Fonction pour calculer le chi² du tableau de contingence
+def chi2(k, n, f, N):
+    a, b, c, d = tableau_contingence(k, n, f, N)
+    denominateur = (a + b) * (c + d) * (a + c) * (b + d)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominateur > 0, (a + b + c + d) * (a * d - b * c) ** 2 / denominateur, 0)
+
+
+# Fonction pour calculer le log de la probabilité hypergéométrique P(X = k)
+# (k succès dans un échantillon de n tirages, pour f succès dans une population de N)
+def log_probabilite_hypergeometrique(k, n, f, N):
+    return (gammaln(f + 1) - gammaln(k + 1) - gammaln(f - k + 1)
+            + gammaln(N - f + 1) - gammaln(n - k + 1) - gammaln(N - f - n + k + 1)
+            - gammaln(N + 1) + gammaln(n + 1) + gammaln(N - n + 1))
+
+
+# Fonction pour calculer le log d'une queue hypergéométrique, P(X >= k) (superieure) ou P(X <= k)
+# Chaque terme s'obtient à partir du précédent par le rapport P(X = x ± 1) / P(X = x) ; toutes les paires
+# avancent ensemble et une paire sort du calcul dès que ses termes deviennent négligeables
+# (scipy.stats.hypergeom évalue chaque paire séparément, trop lentement pour une matrice entière)
+def log_queue_hypergeometrique(k, n, f, N, superieure=True):
+    x = k.copy()
+    terme = np.ones_like(k)
+    somme = np.ones_like(k)
+    actifs = np.arange(len(k))
+    while len(actifs):
+        xa, na, fa, Na = x[actifs], n[actifs], f[actifs], N[actifs]
+        if superieure:
+            rapport = (fa - xa) * (na - xa) / ((xa + 1) * (Na - fa - na + xa + 1))
+            x[actifs] = xa + 1
+        else:
+            rapport = xa * (Na - fa - na + xa) / ((fa - xa + 1) * (na - xa + 1))
+            x[actifs] = xa - 1
+        # Le rapport s'annule à la borne du support : la queue est alors complète
+        terme[actifs] *= np.maximum(rapport, 0)
+        somme[actifs] += terme[actifs]
+        actifs = actifs[terme[actifs] > PRECISION_QUEUE * somme[actifs]]
+    return np.minimum(log_probabilite_hypergeometrique(k, n, f, N) + np.log(somme), 0)
+
+
+# Fonction pour calculer la spécificité hypergéométrique (modèle de Lafon) en log10 :
+# positive (-log10 P(X >= k)) quand le cooccurrent est sur-représenté, négative (log10 P(X <= k)) sinon
+def specificite(k, n, f, N):
+    k = np.asarray(k, dtype=np.float64)
+    n = np.broadcast_to(np.asarray(n, dtype=np.float64), k.shape)
+    f = np.broadcast_to(np.asarray(f, dtype=np.float64), k.shape)
+    N = np.maximum(np.broadcast_to(np.asarray(N, dtype=np.float64), k.shape), np.maximum(n, f))
+    # Les fenêtres qui se chevauchent peuvent sortir k du support de la loi
+    k = np.clip(k, np.maximum(n + f - N, 0), np.minimum(n, f))
+    attraction = k >= n * f / np.maximum(N, 1)
+    scores = np.empty_like(k)
+    scores[attraction] = -log_queue_hypergeometrique(k[attraction], n[attraction], f[attraction], N[attraction])
+    scores[~attraction] = log_queue_hypergeometrique(k[~attraction], n[~attraction], f[~attraction], N[~attraction],
+                                                     superieure=False)
+    return scores / np.log(10)
+
+
+# Fonction pour calculer toutes les mesures d'association d'un ensemble de paires
+def scores_association(k, n, f, N):
+    return {
+        LOG_VRAISEMBLANCE: log_vraisemblance(k, n, f, N),
+        PMI: information_mutuelle(k, n, f, N),
+        PPMI: information_mutuelle_positive(k, n, f, N),
+        CHI2: chi2(k, n, f, N),
+        SPECIFICITE: specificite(k, n, f, N),
+    }
+
+
+# Fonction pour calculer les associations des cooccurrents d'un ou plusieurs mots-clés
+# Les fenêtres des mots-clés forment l'échantillon (n tokens), comparé au corpus entier (N tokens) :
+# chaque cooccurrent est observé k fois dans les fenêtres pour f occurrences dans le corpus
+def associations_mots_cles(index, mots_cles, window_size=10):
+    identifiants = identifiants_termes(index, mots_cles)
+    if len(identifiants) == 0:
+        return pd.DataFrame(columns=['Cooccurrence', 'Frequency', 'Corpus frequency'] + MESURES)
+    comptes = compter_cooccurrences(index, identifiants, window_size)
+    frequences = np.bincount(index['tokens'], minlength=len(comptes))
+    cooccurrents = np.flatnonzero(comptes)
+
+    k = comptes[cooccurrents]
+    f = frequences[cooccurrents]
+    resultats = pd.DataFrame({'Cooccurrence': index['vocabulaire'][cooccurrents], 'Frequency': k,
+                              'Corpus frequency': f})
+    for mesure, scores in scores_association(k, comptes.sum(), f, len(index['tokens'])).items():
+        resultats[mesure] = scores
+    return resultats.sort_values('Frequency', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# Fonction pour calculer les associations de toutes les paires d'une matrice de cooccurrences symétrique
+# Les marges sont celles de la matrice (somme de la ligne et de la colonne, total des cooccurrences) :
+# les scores sont symétriques et chaque paire n'apparaît qu'une fois
+def associations_matrice(matrice, termes):
+    marges = np.asarray(matrice.sum(axis=1)).ravel()
+    paires = sparse.triu(matrice, k=1).tocoo()
+    resultats = pd.DataFrame({'Source': termes[paires.row], 'Target': termes[paires.col], 'Weight': paires.data})
+    for mesure, scores in scores_association(paires.data, marges[paires.row], marges[paires.col],
+                                             marges.sum()).items():
+        resultats[mesure] = scores
+    return resultats
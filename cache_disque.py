@@ -0,0 +1,62 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import hashlib
+import os
+import re
+import numpy as np
+
+# Répertoire racine des caches persistants (annotations, embeddings, modèles...)
+REPERTOIRE_CACHE = os.path.expanduser("~/Documents/ATA/.cache")
+
+# Nombre maximal de processus proposé par les pages (annotation SpaCy, encodage, LDA)
+NOMBRE_PROCESSUS_MAX = os.cpu_count() or 1
+
+
+# Fonction pour obtenir (et créer si nécessaire) un sous-répertoire du cache
+def repertoire_cache(*parties):
+    chemin = os.path.join(REPERTOIRE_CACHE, *[nettoyer_nom(partie) for partie in parties])
+    os.makedirs(chemin, exist_ok=True)
+    return chemin
+
+
+# Fonction pour rendre un nom (modèle, version...) utilisable comme nom de répertoire
+def nettoyer_nom(nom):
+    return re.sub(r'[^\w.\-]+', '_', str(nom))
+
+
+# Fonction pour écrire un fichier de façon atomique : écriture dans un fichier temporaire propre au processus,
+# puis remplacement du fichier final (un lecteur ne voit jamais un fichier à moitié écrit)
+# ecrire : fonction qui reçoit le fichier ouvert (en binaire, ou en texte UTF-8 avec mode='w')
+def ecrire_atomique(chemin, ecrire, mode='wb'):
+    chemin_temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(chemin_temporaire, mode, encoding=None if 'b' in mode else 'utf-8') as fichier:
+        ecrire(fichier)
+    os.replace(chemin_temporaire, chemin)
+
+
+# Fonction pour calculer l'empreinte d'un texte
+def hacher_texte(texte):
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+# Fonction pour encoder une liste de chaînes en un tableau d'octets UTF-8 et un tableau de bornes
+def encoder_chaines(chaines):
+    octets = [chaine.encode('utf-8') for chaine in chaines]
+    bornes = np.zeros(len(octets) + 1, dtype=np.int64)
+    np.cumsum([len(o) for o in octets], out=bornes[1:])
+    return np.frombuffer(b''.join(octets), dtype=np.uint8), bornes
+
+
+# Fonction pour décoder une sélection de chaînes encodées par encoder_chaines
+def decoder_chaines(donnees, bornes, indices):
+    brut = donnees.tobytes()
+    return [brut[bornes[i]:bornes[i + 1]].decode('utf-8') for i in indices]
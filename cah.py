@@ -10,14 +10,19 @@
 ##########################################
 
 import pandas as pd
-import re
-from sentence_transformers import SentenceTransformer
 from scipy.cluster.hierarchy import dendrogram, linkage, fcluster
 import seaborn as sns
 import matplotlib.pyplot as plt
 import os
 import numpy as np
 import streamlit as st
+from sklearn.cluster import MiniBatchKMeans
+from corpus import lire_corpus
+from cache_disque import ecrire_atomique, repertoire_cache
+from concordancier import (FORMAT_CSV, afficher_concordancier, centroides_clusters, exporter_concordance,
+                           parametres_concordance, scores_cosinus)
+from embeddings import charger_embeddings, parametres_encodage
+from tokenisation import normaliser_texte
 import nltk
 from nltk.corpus import stopwords
 
@@ -27,6 +32,24 @@ nltk.download('stopwords')
 # Utiliser les stop words français de NLTK
 french_stopwords = stopwords.words('french')
 
+# Backend optionnel pour une CAH exacte plus rapide et économe en mémoire
+try:
+    import fastcluster
+except ImportError:
+    fastcluster = None
+
+# Méthodes de calcul de la CAH
+METHODE_EXACTE = "Exacte (SciPy)"
+METHODE_EXACTE_RAPIDE = "Exacte rapide (fastcluster)"
+METHODE_HYBRIDE = "Hybride (pré-clustering en micro-clusters puis Ward)"
+
+# Nombre de niveaux affichés en bas du dendrogramme tronqué
+NIVEAUX_DENDROGRAMME = 30
+
+# Critères de découpage du dendrogramme
+COUPE_DISTANCE = "Distance"
+COUPE_NOMBRE = "Nombre de clusters"
+
 # Fonction principale pour afficher l'interface CAH
 def afficher_interface_cah():
     # Insérer le titre de l'application
@@ -49,70 +72,179 @@ def afficher_interface_cah():
 
     uploaded_file = st.file_uploader("Téléchargez un fichier texte pour l'analyse CAH", type="txt")
     if uploaded_file is not None:
-        st.session_state['uploaded_file'] = uploaded_file.getvalue().decode("utf-8")
+        st.session_state['uploaded_file'] = uploaded_file
         st.session_state['file_name'] = uploaded_file.name
         st.success(f"Fichier {st.session_state['file_name']} chargé avec succès.")
 
         save_directory = st.text_input("Définir le répertoire de sauvegarde",
                                        value=os.path.expanduser("~/Documents/ATA/CAH"))
+        parametres_embeddings = parametres_encodage()
+        format_concordance = parametres_concordance("cah")
+
+        methode = st.radio("Méthode de calcul de la CAH", [METHODE_EXACTE, METHODE_EXACTE_RAPIDE, METHODE_HYBRIDE],
+                           help="La méthode hybride regroupe d'abord les documents en micro-clusters (MiniBatch "
+                                "K-Means) puis applique Ward sur leurs centroïdes pondérés : elle convient aux "
+                                "corpus de plusieurs dizaines de milliers d'articles.")
+        n_micro_clusters = 300
+        if methode == METHODE_HYBRIDE:
+            n_micro_clusters = st.slider("Nombre de micro-clusters", 50, 2000, 300, step=50)
 
         if st.button("Lancer l'Analyse CAH"):
-            analyse_cah(st.session_state['uploaded_file'], save_directory)
+            analyse_cah(st.session_state['uploaded_file'], save_directory, parametres_embeddings, methode,
+                        n_micro_clusters)
+
+        # La hiérarchie calculée reste en session : changer la coupe ne relance que fcluster et les exports
+        resultat = st.session_state.get('cah')
+        if resultat is not None and resultat['file_name'] == st.session_state['file_name']:
+            afficher_resultats_cah(resultat, format_concordance)
+
+
+# Fonction pour calculer une CAH de Ward sur des centroïdes pondérés (effectifs des micro-clusters)
+# Formule de Lance-Williams sur les distances au carré ; la matrice renvoyée suit le format de SciPy
+# (la 4e colonne compte les centroïdes regroupés, comme l'exige SciPy, et non les documents)
+def ward_pondere(centroides, poids):
+    m = len(centroides)
+    centroides = np.asarray(centroides, dtype=np.float64)
+    tailles = np.asarray(poids, dtype=np.float64).copy()
+    feuilles = np.ones(m)
+    identifiants = np.arange(m)
+
+    normes = np.einsum('ij,ij->i', centroides, centroides)
+    distances_carrees = np.maximum(normes[:, None] + normes[None, :] - 2 * centroides @ centroides.T, 0)
+    D = 2 * np.outer(tailles, tailles) / np.add.outer(tailles, tailles) * distances_carrees
+    np.fill_diagonal(D, np.inf)
+
+    Z = np.empty((m - 1, 4))
+    for etape in range(m - 1):
+        i, j = np.unravel_index(np.argmin(D), D.shape)
+        d_ij = D[i, j]
+        Z[etape] = [min(identifiants[i], identifiants[j]), max(identifiants[i], identifiants[j]), np.sqrt(d_ij),
+                    feuilles[i] + feuilles[j]]
 
+        nouvelle_ligne = ((tailles[i] + tailles) * D[i] + (tailles[j] + tailles) * D[j] - tailles * d_ij) \
+            / (tailles[i] + tailles[j] + tailles)
+        D[i, :] = nouvelle_ligne
+        D[:, i] = nouvelle_ligne
+        D[i, i] = np.inf
+        D[j, :] = np.inf
+        D[:, j] = np.inf
+        tailles[i] += tailles[j]
+        feuilles[i] += feuilles[j]
+        identifiants[i] = m + etape
+    return Z
 
-# Fonction pour extraire le contenu des articles
-def parse_article(article_text):
-    lines = article_text.strip().split('\n')
-    content = '\n'.join(lines[1:]) if len(lines) > 1 else ''
-    return {'content': content}
+# Fonction pour calculer la matrice de liaison selon la méthode choisie
+# Renvoie aussi le micro-cluster de chaque document (None pour les méthodes exactes)
+def calculer_linkage(embeddings, methode=METHODE_EXACTE, n_micro_clusters=300):
+    if methode == METHODE_HYBRIDE and n_micro_clusters < len(embeddings):
+        pre_clustering = MiniBatchKMeans(n_clusters=n_micro_clusters, random_state=42, n_init=3)
+        micro_labels = pre_clustering.fit_predict(embeddings)
+        poids = np.bincount(micro_labels, minlength=n_micro_clusters)
+        # Ne garder que les micro-clusters non vides
+        non_vides = np.flatnonzero(poids)
+        renumerotation = np.full(n_micro_clusters, -1)
+        renumerotation[non_vides] = np.arange(len(non_vides))
+        Z = ward_pondere(pre_clustering.cluster_centers_[non_vides], poids[non_vides])
+        return Z, renumerotation[micro_labels]
 
-# Fonction pour prétraiter le texte
-def preprocess_text(text):
-    text = text.lower()
-    text = re.sub(r'\s+', ' ', text)
-    return text
+    if methode == METHODE_EXACTE_RAPIDE:
+        if fastcluster is not None:
+            return fastcluster.linkage_vector(embeddings, method='ward'), None
+        st.warning("Le module fastcluster n'est pas installé (pip install fastcluster) : calcul avec SciPy.")
+    return linkage(embeddings, method='ward'), None
 
-# Fonction pour créer le dendrogramme et effectuer la CAH
-def create_dendrogram_and_cah(embeddings, save_directory, threshold=1.0):
-    # Appliquer la CAH
-    Z = linkage(embeddings, method='ward')
+# Fonction pour obtenir la matrice de liaison d'un corpus, conservée sur disque avec sa signature
+# Les deux méthodes exactes donnent la même hiérarchie et partagent donc la même entrée du cache
+def charger_linkage(embeddings, signature, methode=METHODE_EXACTE, n_micro_clusters=300):
+    variante = f"hybride{n_micro_clusters}" if methode == METHODE_HYBRIDE else "exacte"
+    chemin = os.path.join(repertoire_cache('linkage'), f"{signature}_{variante}.npz")
+    if os.path.exists(chemin):
+        with np.load(chemin) as donnees:
+            micro_labels = donnees['micro_labels'] if 'micro_labels' in donnees.files else None
+            return donnees['Z'], micro_labels
 
-    # Tracer le dendrogramme
+    with st.spinner("Calcul de la classification hiérarchique..."):
+        Z, micro_labels = calculer_linkage(embeddings, methode, n_micro_clusters)
+    tableaux = {'Z': Z} if micro_labels is None else {'Z': Z, 'micro_labels': micro_labels}
+    ecrire_atomique(chemin, lambda fichier: np.savez(fichier, **tableaux))
+    return Z, micro_labels
+
+# Fonction pour tracer le dendrogramme (avec la ligne de coupe si elle est donnée en distance)
+def create_dendrogram(Z, save_directory, threshold=None):
+    # Tracer le dendrogramme, tronqué aux derniers regroupements pour rester lisible et rapide
     fig, ax = plt.subplots(figsize=(10, 7))
-    dendrogram(Z, ax=ax)
+    dendrogram(Z, ax=ax, truncate_mode='lastp', p=NIVEAUX_DENDROGRAMME, color_threshold=threshold)
+    if threshold is not None:
+        ax.axhline(threshold, color='grey', linestyle='--')
     plt.title('Dendrogramme de la Classification Ascendante Hiérarchique')
-    plt.xlabel('Index des observations')
+    plt.xlabel('Index des observations (ou effectif des groupes entre parenthèses)')
     plt.ylabel('Distance')
     plt.savefig(os.path.join(save_directory, "cah_dendrogram.png"))
     st.pyplot(fig)
     plt.close(fig)
 
-    # Créer les clusters à partir du dendrogramme
-    clusters = fcluster(Z, t=threshold, criterion='distance')
+# Fonction pour couper la hiérarchie en clusters (par distance ou par nombre de clusters)
+def couper_dendrogramme(Z, micro_labels, critere=COUPE_DISTANCE, valeur=1.0):
+    if critere == COUPE_NOMBRE:
+        clusters = fcluster(Z, t=valeur, criterion='maxclust')
+    else:
+        clusters = fcluster(Z, t=valeur, criterion='distance')
+    if micro_labels is not None:
+        # Propager le cluster de chaque micro-cluster à ses documents
+        clusters = clusters[micro_labels]
     return clusters
 
-# Fonction pour sauvegarder les résultats
-def save_results(df, clusters, save_directory):
-    df['Cluster'] = clusters
-    save_csv(df, "cah_final_result", save_directory)
+# Fonction pour afficher les paramètres de la coupe du dendrogramme
+def parametres_coupe(Z):
+    critere = st.radio("Couper le dendrogramme selon", [COUPE_DISTANCE, COUPE_NOMBRE], horizontal=True)
+    # Un curseur exige min_value < max_value : une plage réduite à une valeur donne une coupe fixe
+    if critere == COUPE_NOMBRE:
+        nombre_max = min(50, len(Z) + 1)
+        if nombre_max <= 2:
+            valeur = nombre_max
+            st.info(f"La hiérarchie n'a que {len(Z) + 1} feuilles : coupe fixée à {valeur} clusters.")
+        else:
+            valeur = st.slider("Nombre de clusters", 2, nombre_max, min(5, nombre_max))
+    else:
+        distance_max = float(Z[:, 2].max())
+        if distance_max <= 0:
+            valeur = 0.0
+            st.info("Toutes les fusions de la hiérarchie sont à distance nulle : coupe fixée à la distance 0.")
+        else:
+            valeur = st.slider("Distance de coupe", 0.0, distance_max, min(1.0, distance_max),
+                               step=max(distance_max / 200, 1e-3))
+    return critere, valeur
+
+# Fonction pour afficher le dendrogramme et les résultats de la coupe choisie
+# Les exports ne sont refaits que si la coupe change (pas lors de la navigation dans le concordancier)
+def afficher_resultats_cah(resultat, format_concordance=FORMAT_CSV):
+    critere, valeur = parametres_coupe(resultat['Z'])
+    create_dendrogram(resultat['Z'], resultat['save_directory'],
+                      threshold=valeur if critere == COUPE_DISTANCE else None)
 
-    concordance_cah = create_concordance(df, clusters)
-    save_csv(concordance_cah, "cah_concordance", save_directory)
+    clusters = couper_dendrogramme(resultat['Z'], resultat['micro_labels'], critere, valeur)
+    st.write(f"{len(np.unique(clusters))} clusters obtenus")
+    coupe = (critere, valeur, format_concordance)
+    if resultat.get('coupe') != coupe:
+        df = pd.DataFrame({'content': resultat['contenus']})
+        resultat['chemin_concordance'] = save_results(df, clusters, resultat['embeddings'],
+                                                      resultat['save_directory'], format_concordance)
+        resultat['coupe'] = coupe
 
     st.write("### Concordancier CAH")
-    st.dataframe(concordance_cah)
+    afficher_concordancier(resultat['chemin_concordance'], "cah")
 
-    st.write("### Résultats finaux de l'analyse CAH")
-    st.dataframe(df)
+# Fonction pour sauvegarder les résultats
+# Renvoie le chemin du concordancier (une ligne par document, avec sa similarité au centroïde de son cluster)
+def save_results(df, clusters, embeddings, save_directory, format_concordance=FORMAT_CSV):
+    df['Cluster'] = clusters
+    save_csv(df, "cah_final_result", save_directory)
 
-# Fonction pour créer un concordancier
-def create_concordance(df, clusters):
-    concordance_df = pd.DataFrame({
-        'Document': df['content'],
-        'Cluster': [f'Cluster {c + 1}' for c in clusters]
-    })
-    grouped_concordance = concordance_df.groupby('Cluster')['Document'].apply(lambda x: ' '.join(x)).reset_index()
-    return grouped_concordance
+    # fcluster numérote les clusters à partir de 1
+    labels = clusters - 1
+    centroides = centroides_clusters(embeddings, labels, labels.max() + 1)
+    scores = scores_cosinus(embeddings, labels, centroides)
+    return exporter_concordance(df['content'], labels, scores, save_directory, "cah_concordance", format_concordance)
 
 # Fonction pour télécharger un DataFrame en CSV
 def save_csv(dataframe, filename, directory):
@@ -121,22 +253,23 @@ def save_csv(dataframe, filename, directory):
     dataframe.to_csv(path, index=False, encoding='utf-8')
 
 # Fonction principale pour l'analyse CAH
-def analyse_cah(file_content, save_directory):
-    # Séparation des articles par la ligne ****
-    articles = file_content.strip().split('****')
-    articles_data = [parse_article(article) for article in articles if article.strip()]
-
-    # Convertir en DataFrame
-    df = pd.DataFrame(articles_data)
-    df['content'] = df['content'].apply(preprocess_text)
+def analyse_cah(source, save_directory, parametres_embeddings=None, methode=METHODE_EXACTE, n_micro_clusters=300):
+    os.makedirs(save_directory, exist_ok=True)
 
-    # Initialiser SentenceTransformer pour créer des embeddings
-    sentence_model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = sentence_model.encode(df['content'].tolist(), show_progress_bar=True)
+    # Lecture du corpus article par article (la ligne étoilée n'entre pas dans le contenu)
+    df = pd.DataFrame({'content': [normaliser_texte(article['texte']) for article in lire_corpus(source)]})
 
-    # Créer le dendrogramme et effectuer la CAH
-    clusters = create_dendrogram_and_cah(embeddings, save_directory)
+    # Embeddings SentenceTransformer : seuls les articles absents du stock d'embeddings sont encodés
+    embeddings, signature = charger_embeddings(df['content'].tolist(), **(parametres_embeddings or {}))
 
-    # Sauvegarder les résultats
-    save_results(df, clusters, save_directory)
+    # Calculer (ou relire du cache) la hiérarchie ; la coupe et les exports sont faits par afficher_resultats_cah
+    Z, micro_labels = charger_linkage(embeddings, signature, methode, n_micro_clusters)
+    st.session_state['cah'] = {
+        'file_name': st.session_state.get('file_name'),
+        'contenus': df['content'].tolist(),
+        'Z': Z,
+        'micro_labels': micro_labels,
+        'embeddings': embeddings,
+        'save_directory': save_directory,
+    }
 
@@ -0,0 +1,73 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import importlib
+import sys
+import time
+import streamlit as st
+
+# Registre des pages : choix du menu -> (module, fonction d'affichage)
+# Les modules ne sont importés qu'au premier affichage de leur page (spaCy, sentence-transformers, gensim...)
+PAGES = {
+    "K-Means": ("kmeans", "afficher_interface_kmeans"),
+    "CAH": ("cah", "afficher_interface_cah"),
+    "TF-IDF": ("tfidf", "afficher_interface_tfidf"),
+    "LDA": ("lda", "afficher_interface_lda"),
+    "Cooccu": ("analyse_cooccurrences", "afficher_interface_cooccurrences"),
+    "FAQ": ("faq", "afficher_faq"),
+    "Europresse html to text": ("europresse", "afficher_interface_europresse"),
+    "PDF to Text": ("pdf_traitement", "traitement_pdf"),
+    "Search doublons": ("gestion_doublons", "afficher_interface_recherche_doublons"),
+    "MP4 to MP3": ("mp4tomp3", "afficher_interface_mp4_to_mp3"),
+    "MP3 to Text": ("mp3_to_text", "afficher_interface_audio_to_text_whisper"),
+    "Youtube to Text": ("youtube_transcription", "afficher_interface_youtube_transcription"),
+    "Scraper les commentaires YouTube": ("scraper", "afficher_interface_scraper_youtube_comments"),
+    "HTML to Text": ("html_to_text", "afficher_interface_html_to_text"),
+    "Audio France Inter": ("france_inter_audio", "afficher_interface_france_inter_audio"),
+}
+
+# Temps d'import mesurés dans ce processus (partagés entre les reruns et les sessions)
+_temps_import = {}
+_temps_demarrage = {}
+
+
+# Fonction pour importer le module d'une page à la demande en mesurant son coût
+def charger_page(choix):
+    nom_module, nom_fonction = PAGES[choix]
+    if nom_module not in sys.modules:
+        debut = time.perf_counter()
+        importlib.import_module(nom_module)
+        _temps_import[nom_module] = time.perf_counter() - debut
+    return getattr(sys.modules[nom_module], nom_fonction)
+
+
+# Fonction pour afficher une page du registre
+def afficher_page(choix):
+    fonction_affichage = charger_page(choix)
+    fonction_affichage()
+
+
+# Fonction pour afficher le rapport des temps d'import par page
+def afficher_rapport_imports(temps_demarrage=None):
+    # Seule la première exécution du script mesure un démarrage à froid
+    if temps_demarrage is not None:
+        _temps_demarrage.setdefault('interface', temps_demarrage)
+
+    with st.sidebar.expander("Temps de chargement des pages"):
+        if 'interface' in _temps_demarrage:
+            st.write(f"Démarrage de l'interface : {_temps_demarrage['interface']:.2f} s")
+        if not _temps_import:
+            st.write("Aucune page d'analyse chargée pour le moment.")
+            return
+        pages_par_module = {module: choix for choix, (module, _) in PAGES.items()}
+        rapport = [{'Page': pages_par_module[module], 'Module': module, 'Import (s)': round(duree, 2)}
+                   for module, duree in sorted(_temps_import.items(), key=lambda item: item[1], reverse=True)]
+        st.dataframe(rapport, hide_index=True)
@@ -0,0 +1,145 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import csv
+import os
+from itertools import islice
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Export Parquet optionnel (pip install pyarrow)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Formats d'export du concordancier
+FORMAT_CSV = "CSV"
+FORMAT_PARQUET = "Parquet"
+
+# Colonnes du concordancier : une ligne par document
+COLONNES_CONCORDANCE = ['Cluster', 'Score', 'Document']
+
+# Nombre de lignes écrites (ou lues) à la fois
+TAILLE_LOT_CONCORDANCE = 10000
+TAILLES_PAGE = [25, 50, 100, 250]
+
+
+# Fonction pour calculer les centroïdes des clusters (labels numérotés à partir de 0)
+def centroides_clusters(embeddings, labels, n_clusters):
+    tailles = np.bincount(labels, minlength=n_clusters)
+    sommes = np.zeros((n_clusters, embeddings.shape[1]), dtype=np.float64)
+    np.add.at(sommes, labels, embeddings)
+    return sommes / np.maximum(tailles, 1)[:, None]
+
+
+# Fonction pour calculer la similarité cosinus de chaque document avec le centroïde de son cluster
+def scores_cosinus(vecteurs, labels, centroides):
+    vecteurs = np.asarray(vecteurs, dtype=np.float64)
+    centres = centroides[labels]
+    produits = np.einsum('ij,ij->i', vecteurs, centres)
+    normes = np.linalg.norm(vecteurs, axis=1) * np.linalg.norm(centres, axis=1)
+    return produits / np.maximum(normes, 1e-12)
+
+
+# Fonction pour écrire le concordancier ligne à ligne, sans regrouper les documents en mémoire
+# documents, labels (numérotés à partir de 0) et scores sont des itérables parcourus ensemble
+def exporter_concordance(documents, labels, scores, directory, filename, format_export=FORMAT_CSV,
+                         taille_lot=TAILLE_LOT_CONCORDANCE):
+    lignes = ([f'Cluster {label + 1}', round(float(score), 4), document]
+              for document, label, score in zip(documents, labels, scores))
+
+    if format_export == FORMAT_PARQUET and pq is not None:
+        chemin = os.path.join(directory, f"{filename}.parquet")
+        schema = pa.schema([('Cluster', pa.string()), ('Score', pa.float64()), ('Document', pa.string())])
+        with pq.ParquetWriter(chemin, schema) as writer:
+            # Un groupe de lignes Parquet par lot
+            while lot := list(islice(lignes, taille_lot)):
+                colonnes = [list(colonne) for colonne in zip(*lot)]
+                writer.write_table(pa.table(dict(zip(COLONNES_CONCORDANCE, colonnes)), schema=schema))
+        return chemin
+
+    chemin = os.path.join(directory, f"{filename}.csv")
+    with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+        writer = csv.writer(fichier)
+        writer.writerow(COLONNES_CONCORDANCE)
+        writer.writerows(lignes)
+    return chemin
+
+
+# Fonction pour lire le concordancier par lots (DataFrames successifs)
+def lire_lots(chemin, taille_lot=TAILLE_LOT_CONCORDANCE, colonnes=None):
+    if chemin.endswith('.parquet'):
+        for lot in pq.ParquetFile(chemin).iter_batches(batch_size=taille_lot, columns=colonnes):
+            yield lot.to_pandas()
+    else:
+        yield from pd.read_csv(chemin, chunksize=taille_lot, usecols=colonnes)
+
+
+# Fonction pour compter les documents de chaque cluster (seule la colonne Cluster est lue)
+def compter_clusters(chemin):
+    effectifs = pd.Series(dtype='int64')
+    for lot in lire_lots(chemin, colonnes=['Cluster']):
+        effectifs = effectifs.add(lot['Cluster'].value_counts(), fill_value=0)
+    return effectifs.astype('int64')
+
+
+# Fonction pour lire une seule page du concordancier, éventuellement filtrée sur un cluster
+def lire_page(chemin, page, taille_page, cluster=None):
+    debut = page * taille_page
+    if cluster is None and chemin.endswith('.csv'):
+        return pd.read_csv(chemin, skiprows=range(1, debut + 1), nrows=taille_page)
+
+    morceaux = []
+    a_sauter = debut
+    restant = taille_page
+    for lot in lire_lots(chemin):
+        if cluster is not None:
+            lot = lot[lot['Cluster'] == cluster]
+        if a_sauter >= len(lot):
+            a_sauter -= len(lot)
+            continue
+        morceau = lot.iloc[a_sauter:a_sauter + restant]
+        a_sauter = 0
+        morceaux.append(morceau)
+        restant -= len(morceau)
+        if restant == 0:
+            break
+    if not morceaux:
+        return pd.DataFrame(columns=COLONNES_CONCORDANCE)
+    return pd.concat(morceaux, ignore_index=True)
+
+
+# Fonction pour afficher le choix du format d'export du concordancier
+def parametres_concordance(cle):
+    formats = [FORMAT_CSV, FORMAT_PARQUET] if pq is not None else [FORMAT_CSV]
+    return st.selectbox("Format du concordancier", formats, key=f"{cle}_format_concordance")
+
+
+# Fonction pour afficher le concordancier page par page : seule la page visible est lue et envoyée au navigateur
+def afficher_concordancier(chemin, cle):
+    effectifs = compter_clusters(chemin)
+    colonne_filtre, colonne_taille, colonne_page = st.columns(3)
+    clusters = sorted(effectifs.index, key=lambda nom: int(nom.split()[-1]))
+    choix_cluster = colonne_filtre.selectbox("Cluster", ["Tous"] + clusters, key=f"{cle}_cluster")
+    taille_page = colonne_taille.selectbox("Documents par page", TAILLES_PAGE, key=f"{cle}_taille_page")
+
+    cluster = None if choix_cluster == "Tous" else choix_cluster
+    total = int(effectifs.sum()) if cluster is None else int(effectifs[cluster])
+    nombre_pages = max(1, -(-total // taille_page))
+    page = colonne_page.number_input(f"Page (sur {nombre_pages})", min_value=1, max_value=nombre_pages, value=1,
+                                     key=f"{cle}_page")
+
+    st.dataframe(lire_page(chemin, int(page) - 1, taille_page, cluster), use_container_width=True)
+    st.caption(f"{total} documents - concordancier complet enregistré dans {chemin}")
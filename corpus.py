@@ -0,0 +1,76 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import io
+import mmap
+import os
+
+# Marqueur de début d'article au format IRaMuTeQ
+MARQUEUR_ARTICLE = '****'
+
+
+# Fonction pour lire les variables étoilées d'une ligne d'en-tête (**** *source_Le_Monde *date_2024-08-22)
+def parser_variables(entete):
+    variables = {}
+    for mot in entete.split()[1:]:
+        if mot.startswith('*'):
+            nom, _, modalite = mot[1:].partition('_')
+            variables[nom] = modalite
+    return variables
+
+
+# Fonction pour itérer sur les lignes d'une source sans la décoder en entier
+# source : chemin de fichier (lu en mémoire mappée), fichier téléversé (tampon binaire) ou bytes
+def lire_lignes(source, encodage='utf-8'):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fichier:
+            if os.fstat(fichier.fileno()).st_size == 0:
+                return
+            with mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as contenu:
+                for ligne in iter(contenu.readline, b''):
+                    yield ligne.decode(encodage).rstrip('\r\n')
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    source.seek(0)
+    for ligne in source:
+        yield ligne.decode(encodage).rstrip('\r\n')
+
+
+# Fonction pour construire l'enregistrement d'un article
+def creer_article(numero, entete, lignes):
+    return {
+        'numero': numero,
+        'entete': entete,
+        'variables': parser_variables(entete),
+        'texte': '\n'.join(lignes),
+    }
+
+
+# Fonction pour lire un corpus IRaMuTeQ article par article
+# Chaque article commence par une ligne '****' suivie des variables étoilées ; le texte éventuel
+# situé avant le premier en-tête est renvoyé comme un article sans en-tête
+def lire_corpus(source, encodage='utf-8'):
+    numero = 0
+    entete = ''
+    lignes = []
+    for ligne in lire_lignes(source, encodage):
+        if ligne.startswith(MARQUEUR_ARTICLE):
+            if entete or any(l.strip() for l in lignes):
+                yield creer_article(numero, entete, lignes)
+                numero += 1
+            entete = ligne
+            lignes = []
+        else:
+            lignes.append(ligne)
+    if entete or any(l.strip() for l in lignes):
+        yield creer_article(numero, entete, lignes)
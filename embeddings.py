@@ -0,0 +1,252 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import streamlit as st
+from sentence_transformers import SentenceTransformer
+from cache_disque import NOMBRE_PROCESSUS_MAX, repertoire_cache, hacher_texte
+
+# Verrou du stock entre sessions (absent sous Windows : un seul processus Streamlit doit alors écrire)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Modèle SentenceTransformer utilisé par les pages K-Means et CAH
+MODELE_PHRASES = "all-MiniLM-L6-v2"
+
+# Fichiers du stock d'embeddings d'un modèle :
+# cles.txt (une empreinte d'article par ligne), vecteurs.f32 (matrice float32 ligne à ligne), meta.json (dimension)
+FICHIER_CLES = "cles.txt"
+TAILLE_LIGNE_CLE = 65  # empreinte SHA-256 hexadécimale + retour à la ligne
+FICHIER_VECTEURS = "vecteurs.f32"
+FICHIER_META = "meta.json"
+FICHIER_VERROU = "stock.lock"
+
+# Paramètres par défaut de l'encodage
+TAILLE_LOT_ENCODAGE = 32
+
+
+# Fonction pour obtenir le répertoire du stock d'embeddings d'un modèle
+# La troncature des textes modifie les vecteurs : chaque longueur maximale a son propre stock
+def repertoire_embeddings(modele=MODELE_PHRASES, max_seq_length=None):
+    if max_seq_length:
+        return repertoire_cache('embeddings', f"{modele}_max{max_seq_length}")
+    return repertoire_cache('embeddings', modele)
+
+
+# Fonction pour lire la dimension des vecteurs du stock (None si le stock est vide)
+def lire_dimension(repertoire):
+    chemin = os.path.join(repertoire, FICHIER_META)
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, 'r', encoding='utf-8') as fichier:
+        return json.load(fichier)['dimension']
+
+
+# Fonction pour compter les lignes complètes du stock (une clé entière et son vecteur entier)
+# Une écriture interrompue peut laisser une clé ou un vecteur partiel, ou plus de clés que de vecteurs
+def compter_lignes(repertoire):
+    chemin_cles = os.path.join(repertoire, FICHIER_CLES)
+    dimension = lire_dimension(repertoire)
+    if dimension is None or not os.path.exists(chemin_cles):
+        return 0
+    nombre_vecteurs = os.path.getsize(os.path.join(repertoire, FICHIER_VECTEURS)) // (4 * dimension)
+    return min(os.path.getsize(chemin_cles) // TAILLE_LIGNE_CLE, nombre_vecteurs)
+
+
+# Fonction pour lire l'index du stock : empreinte -> numéro de ligne dans vecteurs.f32
+def lire_index(repertoire):
+    nombre_lignes = compter_lignes(repertoire)
+    if nombre_lignes == 0:
+        return {}
+    with open(os.path.join(repertoire, FICHIER_CLES), 'r', encoding='utf-8') as fichier:
+        cles = fichier.read(nombre_lignes * TAILLE_LIGNE_CLE).split()
+    return {cle: ligne for ligne, cle in enumerate(cles)}
+
+
+# Fonction pour réserver le stock à une seule session pendant la relecture de l'index et l'ajout de vecteurs
+@contextmanager
+def verrou_stock(repertoire):
+    with open(os.path.join(repertoire, FICHIER_VERROU), 'a') as fichier:
+        if fcntl is not None:
+            fcntl.flock(fichier.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fichier.fileno(), fcntl.LOCK_UN)
+
+
+# Fonction pour ouvrir les vecteurs du stock en mémoire mappée (lecture seule)
+# Chaque clé de l'index doit avoir son vecteur : un stock incohérent est signalé plutôt que lu de travers
+def ouvrir_vecteurs(repertoire, nombre_lignes):
+    dimension = lire_dimension(repertoire)
+    nombre_vecteurs = os.path.getsize(os.path.join(repertoire, FICHIER_VECTEURS)) // (4 * dimension)
+    if nombre_vecteurs < nombre_lignes:
+        raise ValueError(f"Stock d'embeddings incohérent dans {repertoire} : {nombre_lignes} clés pour "
+                         f"{nombre_vecteurs} vecteurs")
+    return np.memmap(os.path.join(repertoire, FICHIER_VECTEURS), dtype=np.float32, mode='r',
+                     shape=(nombre_lignes, dimension))
+
+
+# Fonction pour ajouter des vecteurs au stock (les vecteurs sont écrits avant leurs clés)
+# À appeler sous verrou_stock, avec nombre_lignes compté sur le disque (compter_lignes) sous ce même verrou
+def ajouter_vecteurs(repertoire, empreintes, vecteurs, nombre_lignes):
+    vecteurs = np.ascontiguousarray(vecteurs, dtype=np.float32)
+    chemin_meta = os.path.join(repertoire, FICHIER_META)
+    if not os.path.exists(chemin_meta):
+        with open(chemin_meta, 'w', encoding='utf-8') as fichier:
+            json.dump({'dimension': int(vecteurs.shape[1])}, fichier)
+
+    chemin_vecteurs = os.path.join(repertoire, FICHIER_VECTEURS)
+    with open(chemin_vecteurs, 'ab') as fichier:
+        # Retirer d'éventuels vecteurs orphelins laissés par une écriture interrompue
+        fichier.truncate(nombre_lignes * vecteurs.shape[1] * 4)
+        fichier.write(vecteurs.tobytes())
+
+    # Les lignes de clés ont une largeur fixe : les clés sans vecteur complet sont retirées avant l'ajout
+    with open(os.path.join(repertoire, FICHIER_CLES), 'ab') as fichier:
+        fichier.truncate(nombre_lignes * TAILLE_LIGNE_CLE)
+        fichier.write(''.join(f"{cle}\n" for cle in empreintes).encode('ascii'))
+
+
+# Fonction pour charger une seule fois un modèle SentenceTransformer pour tout le processus
+@st.cache_resource(show_spinner="Chargement du modèle SentenceTransformer...")
+def charger_modele_phrases(modele=MODELE_PHRASES, max_seq_length=None):
+    sentence_model = SentenceTransformer(modele)
+    if max_seq_length:
+        sentence_model.max_seq_length = max_seq_length
+    return sentence_model
+
+
+# Fonction pour démarrer un pool de processus d'encodage CPU, arrêté en sortie de bloc (None pour un seul processus)
+# Chaque processus charge sa copie du modèle : le pool est démarré une fois par indexation, pas une fois par bloc
+@contextmanager
+def pool_encodage(modele=MODELE_PHRASES, max_seq_length=None, n_process=1):
+    if n_process <= 1:
+        yield None
+        return
+    sentence_model = charger_modele_phrases(modele, max_seq_length)
+    pool = sentence_model.start_multi_process_pool(target_devices=['cpu'] * n_process)
+    try:
+        yield pool
+    finally:
+        sentence_model.stop_multi_process_pool(pool)
+
+
+# Fonction pour encoder des textes avec un modèle SentenceTransformer
+# encode regroupe déjà les textes de longueur proche dans les lots et rend les vecteurs dans l'ordre d'origine ;
+# avec un pool (ou n_process > 1, pool démarré pour ce seul appel), l'encodage est réparti sur des processus CPU
+def encoder_textes(textes, modele=MODELE_PHRASES, max_seq_length=None, batch_size=TAILLE_LOT_ENCODAGE, n_process=1,
+                   pool=None):
+    if pool is None and n_process > 1:
+        with pool_encodage(modele, max_seq_length, n_process) as pool:
+            return encoder_textes(textes, modele, max_seq_length, batch_size, pool=pool)
+    sentence_model = charger_modele_phrases(modele, max_seq_length)
+
+    debut = time.perf_counter()
+    if pool is not None:
+        vecteurs = sentence_model.encode_multi_process(textes, pool, batch_size=batch_size)
+    else:
+        vecteurs = sentence_model.encode(textes, batch_size=batch_size, show_progress_bar=True)
+    duree = time.perf_counter() - debut
+    st.info(f"{len(textes)} documents encodés en {duree:.1f} s ({len(textes) / max(duree, 1e-9):.1f} documents/s)")
+    return vecteurs
+
+
+# Fonction pour afficher les paramètres de l'encodage
+def parametres_encodage():
+    with st.expander("Paramètres de l'encodage SentenceTransformer"):
+        batch_size = st.number_input("Taille des lots d'encodage", min_value=1, max_value=4096,
+                                     value=TAILLE_LOT_ENCODAGE)
+        max_seq_length = st.number_input("Longueur maximale des textes en tokens (0 = valeur du modèle)",
+                                         min_value=0, max_value=512, value=0)
+        n_process = st.number_input("Nombre de processus d'encodage", min_value=1, max_value=NOMBRE_PROCESSUS_MAX,
+                                    value=1)
+    return {
+        'batch_size': int(batch_size),
+        'max_seq_length': int(max_seq_length) or None,
+        'n_process': int(n_process),
+    }
+
+
+# Fonction pour obtenir les lignes du stock correspondant aux textes, en encodant seulement les textes absents
+# options_encodage : paramètres transmis à encoder_textes (batch_size, n_process)
+# index : index du stock déjà lu (mis à jour sur place), pour enchaîner les appels sur des blocs de textes
+# pool : pool d'encodage déjà démarré (pool_encodage), partagé par les blocs d'une même indexation
+def indexer_embeddings(textes, modele=MODELE_PHRASES, max_seq_length=None, index=None, pool=None,
+                       **options_encodage):
+    repertoire = repertoire_embeddings(modele, max_seq_length)
+    if index is None:
+        index = lire_index(repertoire)
+    empreintes = [hacher_texte(texte) for texte in textes]
+
+    manquants = {}
+    for empreinte, texte in zip(empreintes, textes):
+        if empreinte not in index and empreinte not in manquants:
+            manquants[empreinte] = texte
+    if manquants:
+        # L'encodage se fait hors verrou ; d'autres sessions ont pu compléter le stock entre-temps
+        vecteurs = encoder_textes(list(manquants.values()), modele, max_seq_length, pool=pool, **options_encodage)
+        with verrou_stock(repertoire):
+            # L'index lu hors verrou peut venir d'un ajout en cours : seul l'état du disque sous verrou fait foi
+            index.clear()
+            index.update(lire_index(repertoire))
+            nombre_lignes = compter_lignes(repertoire)
+            rangs = [rang for rang, empreinte in enumerate(manquants) if empreinte not in index]
+            nouvelles = [empreinte for empreinte in manquants if empreinte not in index]
+            if nouvelles:
+                ajouter_vecteurs(repertoire, nouvelles, vecteurs[rangs], nombre_lignes)
+                index.update({empreinte: nombre_lignes + rang for rang, empreinte in enumerate(nouvelles)})
+
+    lignes = np.array([index[empreinte] for empreinte in empreintes], dtype=np.int64)
+    return ouvrir_vecteurs(repertoire, len(index)), lignes
+
+
+# Fonction pour indexer un flux de textes bloc par bloc (le corpus n'est jamais chargé en entier)
+# Renvoie les vecteurs du stock en mémoire mappée (None pour un flux vide) et les lignes des textes, dans l'ordre du flux
+def indexer_flux_embeddings(textes, taille_bloc=10000, modele=MODELE_PHRASES, max_seq_length=None,
+                            **options_encodage):
+    repertoire = repertoire_embeddings(modele, max_seq_length)
+    index = lire_index(repertoire)
+    lignes = []
+    bloc = []
+    with pool_encodage(modele, max_seq_length, options_encodage.get('n_process', 1)) as pool:
+        for texte in textes:
+            bloc.append(texte)
+            if len(bloc) == taille_bloc:
+                lignes.append(indexer_embeddings(bloc, modele, max_seq_length, index, pool, **options_encodage)[1])
+                bloc = []
+        if bloc:
+            lignes.append(indexer_embeddings(bloc, modele, max_seq_length, index, pool, **options_encodage)[1])
+    if not lignes:
+        # Corpus vide : le stock peut ne pas encore exister (dimension inconnue)
+        return None, np.empty(0, dtype=np.int64)
+    return ouvrir_vecteurs(repertoire, len(index)), np.concatenate(lignes)
+
+
+# Fonction pour calculer la signature d'un corpus encodé (sert de clé aux caches des analyses)
+def signature_corpus(lignes, modele=MODELE_PHRASES, max_seq_length=None):
+    empreinte = hashlib.sha256(repertoire_embeddings(modele, max_seq_length).encode('utf-8'))
+    empreinte.update(np.ascontiguousarray(lignes, dtype=np.int64).tobytes())
+    return empreinte.hexdigest()
+
+
+# Fonction pour obtenir les embeddings des textes (en mémoire) et la signature du corpus, à partir du stock disque
+def charger_embeddings(textes, modele=MODELE_PHRASES, max_seq_length=None, **options_encodage):
+    vecteurs, lignes = indexer_embeddings(textes, modele, max_seq_length, **options_encodage)
+    return np.asarray(vecteurs[lignes]), signature_corpus(lignes, modele, max_seq_length)
@@ -11,52 +11,22 @@
 
 import streamlit as st
 import hashlib
+from corpus import lire_corpus
 
 # Longueur minimale par défaut des articles
 LONGUEUR_MINIMALE_PAR_DEFAUT = 300
 
 # Fonction pour détecter les doublons et les articles trop courts dans un fichier texte
-def detecter_doublons(file_content, longueur_minimale):
+def detecter_doublons(source, longueur_minimale):
     articles_uniques = {}
     articles_doublons = []
     articles_courts = []
-    contenu_article = []
-    entete_article = ''
-    debut_article = False
-
-    lines = file_content.splitlines()
-
-    for ligne in lines:
-        if ligne.startswith('**** '):  # Ligne de début d'article
-            if debut_article:  # Si on est déjà dans un article
-                corps_article = ''.join(contenu_article)
-                texte_article = entete_article + corps_article
-                hash_article = hashlib.sha256(corps_article.encode('utf-8')).hexdigest()
-                # Vérification des doublons
-                if hash_article in articles_uniques:
-                    if len(corps_article) > len(articles_uniques[hash_article][1]):
-                        articles_doublons.append((articles_uniques[hash_article][0], articles_uniques[hash_article][1]))
-                        articles_uniques[hash_article] = (entete_article, corps_article)
-                    else:
-                        articles_doublons.append((entete_article, corps_article))
-                else:
-                    articles_uniques[hash_article] = (entete_article, corps_article)
-                # Vérification de la longueur minimale
-                if len(corps_article) < longueur_minimale:
-                    articles_courts.append((entete_article, corps_article))
-                contenu_article = []
-                entete_article = ligne
-            else:
-                debut_article = True
-                entete_article = ligne
-        else:
-            contenu_article.append(ligne)
 
-    # Traitement du dernier article
-    if contenu_article:
-        corps_article = ''.join(contenu_article)
-        texte_article = entete_article + corps_article
+    for article in lire_corpus(source):
+        entete_article = article['entete']
+        corps_article = article['texte'].replace('\n', '')
         hash_article = hashlib.sha256(corps_article.encode('utf-8')).hexdigest()
+        # Vérification des doublons
         if hash_article in articles_uniques:
             if len(corps_article) > len(articles_uniques[hash_article][1]):
                 articles_doublons.append((articles_uniques[hash_article][0], articles_uniques[hash_article][1]))
@@ -65,6 +35,7 @@ def detecter_doublons(file_content, longueur_minimale):
                 articles_doublons.append((entete_article, corps_article))
         else:
             articles_uniques[hash_article] = (entete_article, corps_article)
+        # Vérification de la longueur minimale
         if len(corps_article) < longueur_minimale:
             articles_courts.append((entete_article, corps_article))
 
@@ -98,10 +69,8 @@ def afficher_interface_recherche_doublons():
                                         value=LONGUEUR_MINIMALE_PAR_DEFAUT)
 
     if uploaded_file:
-        file_content = uploaded_file.getvalue().decode("utf-8")
-
         if st.button("Analyser les doublons et les articles courts"):
-            articles_uniques, articles_doublons, articles_courts = detecter_doublons(file_content, longueur_minimale)
+            articles_uniques, articles_doublons, articles_courts = detecter_doublons(uploaded_file, longueur_minimale)
 
             st.write(f"### Nombre d'articles en double : {len(articles_doublons)}")
             st.write(f"### Nombre d'articles trop courts : {len(articles_courts)}")
@@ -0,0 +1,129 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import hashlib
+import os
+import numpy as np
+from scipy import sparse
+from cache_disque import repertoire_cache, encoder_chaines, decoder_chaines, ecrire_atomique
+from tokenisation import encoder_textes
+
+# Version du format de l'index (à incrémenter si la tokenisation ou les tableaux changent)
+VERSION_INDEX = 4
+
+
+# Fonction pour construire l'index positionnel d'un corpus à partir du texte de chaque article
+# Renvoie un dictionnaire de tableaux :
+# - tokens : identifiant entier de chaque token du corpus, articles mis bout à bout
+# - bornes : position du premier token de chaque article (et position de fin du dernier)
+# - vocabulaire : terme de chaque identifiant (tableau d'objets ; sur disque, octets UTF-8 et bornes)
+# - positions, debuts : listes de positions par terme (positions[debuts[t]:debuts[t + 1]] pour le terme t)
+def construire_index(articles, stopwords=frozenset()):
+    vocabulaire = {}
+    tokens, bornes = encoder_textes(articles, vocabulaire, frozenset(stopwords))
+    positions = np.argsort(tokens, kind='stable').astype(np.int64)
+    debuts = np.searchsorted(tokens[positions], np.arange(len(vocabulaire) + 1))
+    return {
+        'tokens': tokens,
+        'bornes': bornes,
+        'vocabulaire': np.array(list(vocabulaire), dtype=object),
+        'positions': positions,
+        'debuts': debuts.astype(np.int64),
+    }
+
+
+# Fonction pour obtenir l'index d'un corpus, construit une seule fois par fichier et par liste de mots exclus
+# empreinte : empreinte du contenu du fichier
+def charger_index(articles, empreinte, stopwords):
+    signature = hashlib.sha256(f"{VERSION_INDEX}|{empreinte}|{'|'.join(sorted(stopwords))}".encode('utf-8'))
+    chemin = os.path.join(repertoire_cache('index_positionnel'), f"{signature.hexdigest()}.npz")
+    if os.path.exists(chemin):
+        with np.load(chemin) as donnees:
+            index = {cle: donnees[cle] for cle in donnees.files}
+        bornes_vocabulaire = index.pop('bornes_vocabulaire')
+        index['vocabulaire'] = np.array(decoder_chaines(index['vocabulaire'], bornes_vocabulaire,
+                                                        range(len(bornes_vocabulaire) - 1)), dtype=object)
+        return index
+
+    index = construire_index(articles, stopwords)
+    # Un tableau de chaînes numpy a la largeur de la plus longue (URL, texte collé...) : le vocabulaire est
+    # enregistré comme un seul bloc d'octets et ses bornes
+    donnees = dict(index)
+    donnees['vocabulaire'], donnees['bornes_vocabulaire'] = encoder_chaines(index['vocabulaire'])
+    ecrire_atomique(chemin, lambda fichier: np.savez(fichier, **donnees))
+    return index
+
+
+# Fonction pour obtenir les identifiants des termes présents dans l'index (les termes absents sont ignorés)
+def identifiants_termes(index, termes):
+    return np.flatnonzero(np.isin(index['vocabulaire'], list(termes)))
+
+
+# Fonction pour obtenir les positions (triées) de toutes les occurrences d'un ensemble de termes
+def positions_termes(index, identifiants):
+    debuts = index['debuts']
+    return np.sort(np.concatenate([index['positions'][debuts[t]:debuts[t + 1]] for t in identifiants]
+                                  or [np.empty(0, dtype=np.int64)]))
+
+
+# Fonction pour compter les cooccurrents d'un ou plusieurs mots-clés dans une fenêtre de window_size tokens
+# de part et d'autre de chaque occurrence, sans dépasser les limites de l'article
+# Renvoie un tableau de comptes indexé par identifiant de terme (les mots-clés eux-mêmes ne sont pas comptés)
+def compter_cooccurrences(index, identifiants, window_size=10):
+    tokens = index['tokens']
+    bornes = index['bornes']
+    pivots = positions_termes(index, identifiants)
+    articles = np.searchsorted(bornes, pivots, side='right') - 1
+    debut_article = bornes[articles]
+    fin_article = bornes[articles + 1]
+
+    comptes = np.zeros(len(index['vocabulaire']), dtype=np.int64)
+    for decalage in range(-window_size, window_size + 1):
+        if decalage == 0:
+            continue
+        voisins = pivots + decalage
+        voisins = voisins[(voisins >= debut_article) & (voisins < fin_article)]
+        comptes += np.bincount(tokens[voisins], minlength=len(comptes))
+    comptes[identifiants] = 0
+    return comptes
+
+
+# Fonction pour obtenir les identifiants des top_n termes les plus fréquents du corpus (par fréquence décroissante)
+def termes_frequents(index, top_n):
+    frequences = np.bincount(index['tokens'], minlength=len(index['vocabulaire']))
+    return np.argsort(-frequences, kind='stable')[:top_n]
+
+
+# Fonction pour calculer la matrice terme × terme des cooccurrences entre les top_n termes les plus fréquents
+# Deux termes cooccurrent s'ils sont à au plus window_size tokens l'un de l'autre dans le même article :
+# la ligne d'un terme contient les mêmes comptes que compter_cooccurrences pour ce seul mot-clé
+# Renvoie une matrice creuse symétrique (diagonale nulle) et les identifiants des termes de ses lignes
+def matrice_cooccurrences(index, top_n=1000, window_size=10):
+    termes = termes_frequents(index, top_n)
+    rangs = np.full(len(index['vocabulaire']), -1, dtype=np.int32)
+    rangs[termes] = np.arange(len(termes), dtype=np.int32)
+    rangs_tokens = rangs[index['tokens']]
+    articles = np.repeat(np.arange(len(index['bornes']) - 1), np.diff(index['bornes']))
+
+    # Une paire par décalage : le token p et le token p + decalage
+    matrice = sparse.csr_matrix((len(termes), len(termes)), dtype=np.int64)
+    for decalage in range(1, window_size + 1):
+        gauche = rangs_tokens[:-decalage]
+        droite = rangs_tokens[decalage:]
+        gardes = (gauche >= 0) & (droite >= 0) & (articles[:-decalage] == articles[decalage:])
+        paires = sparse.coo_matrix((np.ones(np.count_nonzero(gardes), dtype=np.int64),
+                                    (gauche[gardes], droite[gardes])), shape=matrice.shape)
+        matrice = matrice + paires.tocsr()
+
+    matrice = (matrice + matrice.T).tocsr()
+    matrice.setdiag(0)
+    matrice.eliminate_zeros()
+    return matrice, termes
@@ -11,22 +11,34 @@
 
 
 import pandas as pd
-import re
-from sklearn.cluster import KMeans
-from sentence_transformers import SentenceTransformer
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score, davies_bouldin_score
+from joblib import Parallel, delayed
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import seaborn as sns
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
-from umap import UMAP
 import plotly.express as px
 import os
 import numpy as np
 import streamlit as st
+from concordancier import (FORMAT_CSV, afficher_concordancier, exporter_concordance, parametres_concordance,
+                           scores_cosinus)
+from corpus import lire_corpus
+from embeddings import charger_embeddings, indexer_flux_embeddings, parametres_encodage
+from projection import calculer_projection, projeter, parametres_projection
+from tokenisation import frequences_termes, normaliser_texte
 import nltk
 from nltk.corpus import stopwords
 
+# Algorithmes disponibles pour la recherche du nombre de clusters
+ALGORITHMES_SELECTION = ["KMeans", "MiniBatchKMeans"]
+
+# Modes d'analyse : tout le corpus en mémoire, ou MiniBatch K-Means par blocs lus sur disque
+MODE_STANDARD = "Standard (embeddings en mémoire)"
+MODE_HORS_MEMOIRE = "Gros corpus (MiniBatch K-Means hors mémoire)"
+
 # Télécharger le corpus de stop words si nécessaire
 nltk.download('stopwords')
 
@@ -53,44 +65,60 @@ def afficher_interface_kmeans():
 
     uploaded_file = st.file_uploader("Téléchargez un fichier texte pour K-Means", type="txt")
     if uploaded_file is not None:
-        st.session_state['uploaded_file'] = uploaded_file.getvalue().decode("utf-8")
+        st.session_state['uploaded_file'] = uploaded_file
         st.session_state['file_name'] = uploaded_file.name
         st.success(f"Fichier {st.session_state['file_name']} chargé avec succès.")
 
         save_directory = st.text_input("Définir le répertoire de sauvegarde",
                                        value=os.path.expanduser("~/Documents/ATA/KMEANS"))
         n_clusters = st.slider("Choisissez le nombre de clusters", 2, 20, 5)
-        min_df = st.slider("Minimum document frequency (min_df)", 0.0, 1.0, 0.1)
-        max_df = st.slider("Maximum document frequency (max_df)", 0.0, 1.0, 0.9)
-
-        if st.button("Lancer l'Analyse K-Means"):
-            analyse_kmeans(st.session_state['uploaded_file'], save_directory, n_clusters, min_df, max_df)
-
-
-# Fonction pour extraire le contenu des articles
-def parse_article(article_text):
-    lines = article_text.strip().split('\n')
-    # Filtrer les lignes qui commencent par ****
-    lines = [line for line in lines if not line.startswith('****')]
-    content = ' '.join(lines) if len(lines) > 1 else ''
-    return {'content': content}
-
-
-# Fonction pour prétraiter le texte
-def preprocess_text(text):
-    text = text.lower()
-    text = re.sub(r'\s+', ' ', text)
-    return text
-
-
-# Fonction pour créer le concordancier
-def create_concordance(df, clusters):
-    concordance_df = pd.DataFrame({
-        'Document': df['content'],
-        'Cluster': [f'Cluster {c + 1}' for c in clusters]
-    })
-    grouped_concordance = concordance_df.groupby('Cluster')['Document'].apply(lambda x: ' '.join(x)).reset_index()
-    return grouped_concordance
+        mode = st.radio("Mode d'analyse", [MODE_STANDARD, MODE_HORS_MEMOIRE])
+        parametres_embeddings = parametres_encodage()
+        format_concordance = parametres_concordance("kmeans")
+
+        if mode == MODE_HORS_MEMOIRE:
+            st.info("Les embeddings sont lus sur disque par blocs : seuls les tailles et centroïdes des clusters, "
+                    "la matrice de similarité et les exports CSV sont produits.")
+            taille_bloc = st.number_input("Nombre de documents par bloc", min_value=100, value=10000, step=1000)
+            n_passes = st.slider("Nombre de passes d'apprentissage sur le corpus", 1, 10, 3)
+
+            if st.button("Lancer l'Analyse K-Means"):
+                analyse_kmeans_hors_memoire(st.session_state['uploaded_file'], save_directory, n_clusters,
+                                            parametres_embeddings, int(taille_bloc), n_passes, format_concordance)
+        else:
+            min_df = st.slider("Minimum document frequency (min_df)", 0.0, 1.0, 0.1)
+            max_df = st.slider("Maximum document frequency (max_df)", 0.0, 1.0, 0.9)
+            parametres_selection = parametres_selection_k()
+            composantes_pca = parametres_projection()
+
+            if st.button("Lancer l'Analyse K-Means"):
+                analyse_kmeans(st.session_state['uploaded_file'], save_directory, n_clusters, min_df, max_df,
+                               parametres_embeddings, parametres_selection, composantes_pca, format_concordance)
+
+        # Le concordancier reste consultable page par page après l'analyse
+        concordance = st.session_state.get('concordance_kmeans')
+        if concordance is not None and concordance['file_name'] == st.session_state['file_name']:
+            st.write("### Concordancier KMeans")
+            afficher_concordancier(concordance['chemin'], "kmeans")
+
+
+# Fonction pour afficher les paramètres de la recherche du nombre de clusters
+def parametres_selection_k():
+    with st.expander("Recherche du nombre de clusters (courbe du coude)"):
+        actif = st.checkbox("Calculer la courbe du coude et les indicateurs de qualité", value=True)
+        k_max = st.slider("Nombre maximum de clusters testés", 3, 40, 20)
+        algorithme = st.selectbox("Algorithme utilisé pour le balayage", ALGORITHMES_SELECTION)
+        taille_echantillon = st.number_input("Taille de l'échantillon d'embeddings (0 = tout le corpus)",
+                                             min_value=0, value=0, step=1000)
+        taille_silhouette = st.number_input("Taille de l'échantillon pour la silhouette", min_value=100,
+                                            value=5000, step=1000)
+    return {
+        'actif': actif,
+        'k_max': k_max,
+        'algorithme': algorithme,
+        'taille_echantillon': int(taille_echantillon),
+        'taille_silhouette': int(taille_silhouette),
+    }
 
 
 # Fonction pour télécharger un DataFrame en CSV
@@ -102,6 +130,11 @@ def save_csv(dataframe, filename, directory):
 # Fonction pour afficher et télécharger la matrice de similarité cosinus entre les clusters
 def display_similarity_matrix(embeddings, cluster_labels, directory):
     cluster_centers = [embeddings[cluster_labels == i].mean(axis=0) for i in range(max(cluster_labels) + 1)]
+    display_centroid_similarity(cluster_centers, directory)
+
+
+# Fonction pour afficher et télécharger la matrice de similarité cosinus entre des centroïdes
+def display_centroid_similarity(cluster_centers, directory):
     similarity_matrix = cosine_similarity(cluster_centers)
 
     cluster_names = [f'Cluster {i + 1}' for i in range(len(cluster_centers))]
@@ -120,11 +153,11 @@ def display_similarity_matrix(embeddings, cluster_labels, directory):
 
 # Fonction pour afficher les nuages de mots pour chaque cluster
 def display_wordclouds(df, cluster_labels, directory):
+    mots_exclus = frozenset(french_stopwords)
     for cluster in set(cluster_labels):
         cluster_data = df['content'][cluster_labels == cluster]
-        wordcloud_text = ' '.join(cluster_data)
-        wordcloud = WordCloud(width=800, height=400, background_color='white',
-                              stopwords=set(french_stopwords)).generate(wordcloud_text)
+        frequences = frequences_termes(cluster_data, mots_exclus)
+        wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(frequences)
 
         plt.figure(figsize=(10, 5))
         plt.imshow(wordcloud, interpolation='bilinear')
@@ -136,10 +169,7 @@ def display_wordclouds(df, cluster_labels, directory):
 
 
 # Fonction pour afficher la visualisation des clusters en 2D
-def display_cluster_visualization(embeddings, labels, directory):
-    umap_model = UMAP(n_components=2, random_state=42)
-    reduced_embeddings = umap_model.fit_transform(embeddings)
-
+def display_cluster_visualization(reduced_embeddings, labels, directory):
     viz_df = pd.DataFrame({
         'x': reduced_embeddings[:, 0],
         'y': reduced_embeddings[:, 1],
@@ -155,10 +185,10 @@ def display_cluster_visualization(embeddings, labels, directory):
 
 
 # Fonction pour visualiser les centroides des clusters
-def display_centroid_visualization(embeddings, cluster_labels, directory):
+def display_centroid_visualization(embeddings, cluster_labels, projection, directory):
     cluster_centers = np.array([embeddings[cluster_labels == i].mean(axis=0) for i in range(max(cluster_labels) + 1)])
-    umap_model = UMAP(n_components=2, random_state=42)
-    reduced_centroids = umap_model.fit_transform(cluster_centers)
+    # Les centroïdes sont placés dans le plan déjà calculé pour les documents
+    reduced_centroids = projeter(projection, cluster_centers)
 
     df_centroids = pd.DataFrame({
         'x': reduced_centroids[:, 0],
@@ -178,9 +208,7 @@ def display_centroid_visualization(embeddings, cluster_labels, directory):
 
 
 # Fonction pour visualiser les clusters regroupés en bulles
-def display_grouped_bubble_chart(embeddings, cluster_labels, directory):
-    umap_model = UMAP(n_components=2, random_state=42)
-    reduced_embeddings = umap_model.fit_transform(embeddings)
+def display_grouped_bubble_chart(reduced_embeddings, cluster_labels, directory):
     df = pd.DataFrame({
         'x': reduced_embeddings[:, 0],
         'y': reduced_embeddings[:, 1],
@@ -199,68 +227,229 @@ def display_grouped_bubble_chart(embeddings, cluster_labels, directory):
     st.plotly_chart(fig)
 
 
-# Fonction pour calculer la courbe du coude
-def plot_elbow_curve(embeddings, save_directory):
-    # Créer le répertoire s'il n'existe pas
-    if not os.path.exists(save_directory):
-        os.makedirs(save_directory)
+# Fonction pour créer un modèle K-Means selon l'algorithme choisi
+def creer_modele_kmeans(k, algorithme="KMeans"):
+    if algorithme == "MiniBatchKMeans":
+        return MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3)
+    return KMeans(n_clusters=k, random_state=42)
+
+
+# Fonction pour ajuster un modèle pour un k donné et calculer ses indicateurs de qualité
+def evaluer_k(embeddings, k, algorithme, taille_silhouette):
+    modele = creer_modele_kmeans(k, algorithme)
+    labels = modele.fit_predict(embeddings)
+    if 1 < len(set(labels)) < len(embeddings):
+        silhouette = silhouette_score(embeddings, labels, sample_size=min(taille_silhouette, len(embeddings)),
+                                      random_state=42)
+        davies_bouldin = davies_bouldin_score(embeddings, labels)
+    else:
+        silhouette = davies_bouldin = np.nan
+    return {'k': k, 'inertie': modele.inertia_, 'silhouette': silhouette, 'davies_bouldin': davies_bouldin,
+            'modele': modele}
+
+
+# Fonction pour balayer les valeurs de k en parallèle (résultat mis en cache par corpus et par paramètres)
+@st.cache_data(show_spinner="Recherche du nombre de clusters...", max_entries=10)
+def balayer_k(signature, _embeddings, k_max, algorithme, taille_echantillon, taille_silhouette):
+    echantillon = _embeddings
+    if 0 < taille_echantillon < len(_embeddings):
+        indices = np.random.default_rng(42).choice(len(_embeddings), taille_echantillon, replace=False)
+        echantillon = _embeddings[np.sort(indices)]
+    K = range(2, min(k_max, len(echantillon) - 1) + 1)
+    return Parallel(n_jobs=-1)(
+        delayed(evaluer_k)(echantillon, k, algorithme, taille_silhouette) for k in K
+    )
+
 
-    inertia = []
-    K = range(2, 21)
-    for k in K:
-        kmeans = KMeans(n_clusters=k, random_state=42)
-        kmeans.fit(embeddings)
-        inertia.append(kmeans.inertia_)
-
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(K, inertia, 'bx-')
-    ax.set_xlabel('Nombre de Clusters (k)')
-    ax.set_ylabel('Inertie')
-    ax.set_title('Méthode du Coude Pour Déterminer le Nombre Optimal de Clusters')
+# Fonction pour récupérer le modèle du balayage si celui-ci est équivalent à un nouvel ajustement
+def modele_du_balayage(resultats_k, n_clusters, parametres_selection, nombre_documents):
+    if resultats_k is None or parametres_selection['algorithme'] != "KMeans":
+        return None
+    if 0 < parametres_selection['taille_echantillon'] < nombre_documents:
+        return None
+    for resultat in resultats_k:
+        if resultat['k'] == n_clusters:
+            return resultat['modele']
+    return None
+
+
+# Fonction pour calculer la courbe du coude et les indicateurs de qualité
+def plot_elbow_curve(embeddings, save_directory, signature, parametres_selection):
+    # Le balayage commence à k = 2 et s'arrête avant le nombre de documents de l'échantillon
+    taille_echantillon = parametres_selection['taille_echantillon']
+    nombre_documents = taille_echantillon if 0 < taille_echantillon < len(embeddings) else len(embeddings)
+    if nombre_documents < 3:
+        st.warning(f"L'échantillon contient {nombre_documents} documents : il en faut au moins 3 pour chercher "
+                   f"le nombre de clusters. La courbe du coude n'est pas calculée.")
+        return None
+
+    resultats_k = balayer_k(signature, embeddings, parametres_selection['k_max'], parametres_selection['algorithme'],
+                            parametres_selection['taille_echantillon'], parametres_selection['taille_silhouette'])
+    indicateurs = pd.DataFrame([{cle: valeur for cle, valeur in resultat.items() if cle != 'modele'}
+                                for resultat in resultats_k])
+    K = indicateurs['k']
+
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+    axes[0].plot(K, indicateurs['inertie'], 'bx-')
+    axes[0].set_ylabel('Inertie')
+    axes[0].set_title('Méthode du Coude')
+    axes[1].plot(K, indicateurs['silhouette'], 'gx-')
+    axes[1].set_ylabel('Silhouette (plus haut = mieux)')
+    axes[1].set_title('Score de Silhouette')
+    axes[2].plot(K, indicateurs['davies_bouldin'], 'rx-')
+    axes[2].set_ylabel('Davies-Bouldin (plus bas = mieux)')
+    axes[2].set_title('Indice de Davies-Bouldin')
+    for ax in axes:
+        ax.set_xlabel('Nombre de Clusters (k)')
+    fig.suptitle('Indicateurs Pour Déterminer le Nombre Optimal de Clusters')
     st.pyplot(fig)
 
-    # Enregistrer la figure dans le répertoire de sauvegarde
-    plt.savefig(os.path.join(save_directory, "elbow_method.png"))
+    # Enregistrer la figure et les indicateurs dans le répertoire de sauvegarde
+    fig.savefig(os.path.join(save_directory, "elbow_method.png"))
     plt.close(fig)
+    save_csv(indicateurs, "kmeans_selection_k", save_directory)
     st.success(f"Graphique de la méthode du coude enregistré : {os.path.join(save_directory, 'elbow_method.png')}")
+    return resultats_k
 
 
 # Fonction principale pour l'analyse KMeans
-def analyse_kmeans(file_content, save_directory, n_clusters, min_df, max_df):
-    articles = file_content.strip().split('****')
-    articles_data = [parse_article(article) for article in articles if article.strip()]
+def analyse_kmeans(source, save_directory, n_clusters, min_df, max_df, parametres_embeddings=None,
+                   parametres_selection=None, composantes_pca=0, format_concordance=FORMAT_CSV):
+    # Créer le répertoire s'il n'existe pas
+    if not os.path.exists(save_directory):
+        os.makedirs(save_directory)
 
-    df = pd.DataFrame(articles_data)
-    df['content'] = df['content'].apply(preprocess_text)
+    # Lecture du corpus article par article (la ligne étoilée n'entre pas dans le contenu)
+    df = pd.DataFrame({'content': [normaliser_texte(article['texte']) for article in lire_corpus(source)]})
+    if len(df) < n_clusters:
+        st.error(f"Le corpus contient {len(df)} documents : il en faut au moins {n_clusters} "
+                 f"pour former {n_clusters} clusters.")
+        return
 
     # Vectorisation des documents avec les paramètres min_df et max_df
     vectorizer = CountVectorizer(stop_words=french_stopwords, min_df=min_df, max_df=max_df)
     X = vectorizer.fit_transform(df['content'])
 
-    sentence_model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = sentence_model.encode(df['content'].tolist(), show_progress_bar=True)
-
-    # Afficher la courbe du coude
-    plot_elbow_curve(embeddings, save_directory)
-
-    # Appliquer KMeans avec les paramètres fournis
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-    kmeans_labels = kmeans.fit_predict(embeddings)
+    # Seuls les articles absents du stock d'embeddings sont encodés
+    embeddings, signature = charger_embeddings(df['content'].tolist(), **(parametres_embeddings or {}))
+
+    # Afficher la courbe du coude (optionnelle, mise en cache par corpus)
+    resultats_k = None
+    if parametres_selection and parametres_selection['actif']:
+        resultats_k = plot_elbow_curve(embeddings, save_directory, signature, parametres_selection)
+
+    # Appliquer KMeans avec les paramètres fournis (le modèle du balayage est réutilisé s'il est identique)
+    kmeans = modele_du_balayage(resultats_k, n_clusters, parametres_selection, len(embeddings))
+    if kmeans is not None:
+        kmeans_labels = kmeans.labels_
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        kmeans_labels = kmeans.fit_predict(embeddings)
     df['Cluster'] = kmeans_labels
 
-    display_centroid_visualization(embeddings, kmeans_labels, save_directory)
-    display_grouped_bubble_chart(embeddings, kmeans_labels, save_directory)
-    display_cluster_visualization(embeddings, kmeans_labels, save_directory)
+    # Projection 2D calculée une seule fois et partagée par les visualisations
+    projection, reduced_embeddings = calculer_projection(embeddings, signature, composantes_pca)
+
+    display_centroid_visualization(embeddings, kmeans_labels, projection, save_directory)
+    display_grouped_bubble_chart(reduced_embeddings, kmeans_labels, save_directory)
+    display_cluster_visualization(reduced_embeddings, kmeans_labels, save_directory)
     display_similarity_matrix(embeddings, kmeans_labels, save_directory)
     display_wordclouds(df, kmeans_labels, save_directory)
 
-    concordance_kmeans = create_concordance(df, kmeans_labels)
-    save_csv(concordance_kmeans, "kmeans_concordance", save_directory)
+    # Concordancier : une ligne par document avec sa similarité au centroïde de son cluster
+    scores = scores_cosinus(embeddings, kmeans_labels, kmeans.cluster_centers_)
+    chemin_concordance = exporter_concordance(df['content'], kmeans_labels, scores, save_directory,
+                                              "kmeans_concordance", format_concordance)
+    st.session_state['concordance_kmeans'] = {'file_name': st.session_state.get('file_name'),
+                                              'chemin': chemin_concordance}
 
     df.to_csv(os.path.join(save_directory, "kmeans_final_result.csv"), index=False)
 
-    st.write("### Concordancier KMeans")
-    st.dataframe(concordance_kmeans)
 
-    st.write("### Résultats finaux de l'analyse KMeans")
-    st.dataframe(df)
+# Fonction pour parcourir des lignes d'embeddings par blocs lus sur disque
+def lire_blocs(vecteurs, lignes, taille_bloc):
+    for debut in range(0, len(lignes), taille_bloc):
+        yield debut, np.asarray(vecteurs[lignes[debut:debut + taille_bloc]])
+
+
+# Fonction pour ajuster un MiniBatch K-Means par blocs (partial_fit) sans charger tous les embeddings
+# (lignes doit contenir au moins n_clusters documents)
+def ajuster_kmeans_par_blocs(vecteurs, lignes, n_clusters, taille_bloc, n_passes, progression=None):
+    taille_bloc = max(taille_bloc, n_clusters)
+    modele = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=taille_bloc)
+    # Un dernier bloc plus court que n_clusters est rattaché au bloc précédent :
+    # partial_fit refuse un bloc de moins de n_clusters documents, quel que soit l'ordre de parcours
+    debuts = list(range(0, len(lignes), taille_bloc))
+    if len(debuts) > 1 and len(lignes) - debuts[-1] < n_clusters:
+        debuts.pop()
+    fins = debuts[1:] + [len(lignes)]
+    nombre_blocs = len(debuts)
+    for passe in range(n_passes):
+        # Parcourir les blocs dans un ordre différent à chaque passe
+        ordre_blocs = np.random.default_rng(passe).permutation(nombre_blocs)
+        for rang, numero_bloc in enumerate(ordre_blocs, start=1):
+            modele.partial_fit(np.asarray(vecteurs[lignes[debuts[numero_bloc]:fins[numero_bloc]]]))
+            if progression is not None:
+                progression((passe * nombre_blocs + rang) / (n_passes * nombre_blocs))
+    return modele
+
+
+# Fonction pour affecter les documents aux clusters par blocs et cumuler tailles et centroïdes
+def affecter_par_blocs(modele, vecteurs, lignes, taille_bloc):
+    n_clusters = modele.n_clusters
+    labels = np.empty(len(lignes), dtype=np.int32)
+    tailles = np.zeros(n_clusters, dtype=np.int64)
+    sommes = np.zeros((n_clusters, vecteurs.shape[1]), dtype=np.float64)
+    for debut, bloc in lire_blocs(vecteurs, lignes, taille_bloc):
+        labels_bloc = modele.predict(bloc)
+        labels[debut:debut + len(bloc)] = labels_bloc
+        tailles += np.bincount(labels_bloc, minlength=n_clusters)
+        np.add.at(sommes, labels_bloc, bloc)
+    centroides = sommes / np.maximum(tailles, 1)[:, None]
+    return labels, tailles, centroides
+
+
+# Fonction pour calculer par blocs la similarité de chaque document avec le centroïde de son cluster
+def scores_par_blocs(vecteurs, lignes, labels, centroides, taille_bloc):
+    for debut, bloc in lire_blocs(vecteurs, lignes, taille_bloc):
+        yield from scores_cosinus(bloc, labels[debut:debut + len(bloc)], centroides)
+
+
+# Fonction principale pour l'analyse KMeans hors mémoire (corpus volumineux)
+def analyse_kmeans_hors_memoire(source, save_directory, n_clusters, parametres_embeddings, taille_bloc, n_passes,
+                                format_concordance=FORMAT_CSV):
+    if not os.path.exists(save_directory):
+        os.makedirs(save_directory)
+
+    # Encodage par blocs : seuls les numéros de ligne du stock d'embeddings restent en mémoire
+    textes = (normaliser_texte(article['texte']) for article in lire_corpus(source))
+    vecteurs, lignes = indexer_flux_embeddings(textes, taille_bloc, **(parametres_embeddings or {}))
+    st.write(f"Nombre de documents : {len(lignes)}")
+    if len(lignes) < n_clusters:
+        st.error(f"Le corpus contient {len(lignes)} documents : il en faut au moins {n_clusters} "
+                 f"pour former {n_clusters} clusters.")
+        return
+
+    st.write("Apprentissage MiniBatch K-Means")
+    barre = st.progress(0.0)
+    modele = ajuster_kmeans_par_blocs(vecteurs, lignes, n_clusters, taille_bloc, n_passes, progression=barre.progress)
+    labels, tailles, centroides = affecter_par_blocs(modele, vecteurs, lignes, taille_bloc)
+
+    cluster_names = [f'Cluster {i + 1}' for i in range(n_clusters)]
+    df_tailles = pd.DataFrame({'Cluster': cluster_names, 'Documents': tailles})
+    save_csv(df_tailles, "kmeans_cluster_sizes", save_directory)
+    df_centroides = pd.DataFrame(centroides)
+    df_centroides.insert(0, 'Cluster', cluster_names)
+    save_csv(df_centroides, "kmeans_centroids", save_directory)
+    st.write("### Taille des clusters")
+    st.bar_chart(df_tailles.set_index('Cluster'))
+
+    display_centroid_similarity(centroides, save_directory)
+
+    # Le corpus est relu en flux : une ligne écrite par document
+    documents = (normaliser_texte(article['texte']) for article in lire_corpus(source))
+    scores = scores_par_blocs(vecteurs, lignes, labels, centroides, taille_bloc)
+    chemin_concordance = exporter_concordance(documents, labels, scores, save_directory, "kmeans_concordance",
+                                              format_concordance)
+    st.session_state['concordance_kmeans'] = {'file_name': st.session_state.get('file_name'),
+                                              'chemin': chemin_concordance}
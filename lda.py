@@ -11,36 +11,289 @@
 
 
 import streamlit as st
-import spacy
 import pandas as pd
 from gensim import corpora
 from gensim.models.ldamodel import LdaModel
-from gensim.models.phrases import Phrases, Phraser
-import pyLDAvis
-import pyLDAvis.gensim_models as gensimvis
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import numpy as np
+import copy
+import hashlib
 import os
-from streamlit.components.v1 import html
-
-# Chargement du modèle SpaCy pour le français
-nlp = spacy.load('fr_core_news_lg')
-
-
-# Fonction pour le prétraitement des textes avec options de filtrage
-def preprocess_text(text, remove_stopwords=True, pos_filter=None, custom_stopwords=None):
-    doc = nlp(text)
-    tokens = [
-        token.lemma_.lower() for token in doc
-        if token.is_alpha
-           and (not token.is_stop if remove_stopwords else True)
-           and (token.pos_ not in pos_filter if pos_filter else True)
-           and (token.text.lower() not in custom_stopwords if custom_stopwords else True)
-    ]
+import shutil
+from gensim.corpora import MmCorpus
+from ressources_nlp import charger_nlp
+from corpus import lire_corpus
+from annotation import (annoter_avec_cache, codes_pos, formes_tokens, lemmes_tokens, parametres_annotation,
+                        progression_streamlit)
+from cache_disque import NOMBRE_PROCESSUS_MAX
+from lda_modeles import (COHERENCES, FICHIER_CORPUS_MM, FICHIER_DISTRIBUTIONS, FICHIER_VISUALISATION,
+                         TERMES_VISUALISATION, VOCABULAIRE_VISUALISATION, balayer_nombre_topics, charger_modele,
+                         detecter_bigrammes, enregistrer_modele, entrainer_lda, exporter_distributions,
+                         mettre_a_jour_modele, modele_enregistre, preparer_visualisation, pyLDAvis, sacs_de_mots,
+                         serialiser_corpus, textes_bigrammes)
+
+
+# Fonction pour filtrer les tokens d'un article annoté (filtres appliqués sur les colonnes en cache)
+def filtrer_annotation(annotation, remove_stopwords=True, pos_filter=None, custom_stopwords=None):
+    masque = annotation['is_alpha'].copy()
+    if remove_stopwords:
+        masque &= ~annotation['is_stop']
+    if pos_filter:
+        masque &= ~np.isin(annotation['pos'], codes_pos(pos_filter))
+    indices = np.flatnonzero(masque)
+    if custom_stopwords:
+        indices = [i for i, forme in zip(indices, formes_tokens(annotation, indices))
+                   if forme.lower() not in custom_stopwords]
+    tokens = [lemme.lower() for lemme in lemmes_tokens(annotation, indices)]
     return tokens
 
 
+# Fonction pour extraire le texte des articles au fil de la lecture du fichier
+def extraire_articles(source):
+    for article in lire_corpus(source):
+        yield " ".join(line.strip() for line in article['texte'].split('\n'))
+
+
+# Fonction pour obtenir les tokens filtrés de chaque article (annotations relues depuis le cache)
+def textes_tokenises(articles, pos_filter, custom_stopwords, batch_size, n_process):
+    annotations = annoter_avec_cache(articles, charger_nlp, batch_size=batch_size,
+                                     n_process=n_process, progression=progression_streamlit())
+    for annotation in annotations:
+        yield filtrer_annotation(annotation, pos_filter=pos_filter, custom_stopwords=custom_stopwords)
+
+
+# Fonction pour appliquer le modèle enregistré au fichier : mise à jour en ligne et/ou export des distributions
+def appliquer_modele_enregistre(texts, save_directory, mettre_a_jour):
+    lda, dictionary, bigram = charger_modele(save_directory)
+    if mettre_a_jour:
+        nombre_documents = mettre_a_jour_modele(lda, dictionary, bigram, texts)
+        enregistrer_modele(lda, dictionary, bigram, save_directory)
+        st.success(f"Modèle mis à jour avec {nombre_documents} nouveaux documents")
+
+    chemin = exporter_distributions(lda, sacs_de_mots(texts, dictionary, bigram),
+                                    os.path.join(save_directory, FICHIER_DISTRIBUTIONS))
+    st.success(f"Distributions des topics par document sauvegardées dans {chemin}")
+
+
+# Fonction pour afficher la préparation à la demande de la visualisation pyLDAvis du modèle enregistré
+# Le fichier HTML est proposé au téléchargement au lieu d'être injecté dans la page
+def afficher_visualisation_lda(save_directory):
+    st.markdown("### Visualisation LDA")
+    if pyLDAvis is None:
+        st.info("Installez pyLDAvis (pip install pyLDAvis) pour obtenir la visualisation interactive des topics.")
+        return
+    chemin_corpus = os.path.join(save_directory, FICHIER_CORPUS_MM)
+    if not os.path.exists(chemin_corpus):
+        st.info("Relancez l'analyse LDA pour préparer la visualisation (corpus sérialisé introuvable).")
+        return
+
+    with st.expander("Paramètres de la visualisation pyLDAvis"):
+        R = st.slider("Nombre de termes affichés par topic", 10, 50, TERMES_VISUALISATION)
+        vocabulaire_max = st.number_input("Nombre maximal de termes pris en compte (les plus fréquents)",
+                                          min_value=100, value=VOCABULAIRE_VISUALISATION, step=1000)
+        n_jobs = st.number_input("Nombre de processus (-1 = tous les cœurs)", min_value=-1,
+                                 max_value=NOMBRE_PROCESSUS_MAX, value=-1)
+
+    if st.button("Préparer la visualisation pyLDAvis"):
+        lda, dictionary, _ = charger_modele(save_directory)
+        with st.spinner("Préparation de la visualisation pyLDAvis..."):
+            chemin_cache = preparer_visualisation(lda, MmCorpus(chemin_corpus), dictionary,
+                                                  os.path.join(save_directory, FICHIER_DISTRIBUTIONS), R=R,
+                                                  vocabulaire_max=int(vocabulaire_max), n_jobs=int(n_jobs) or -1)
+        visualization_path = os.path.join(save_directory, FICHIER_VISUALISATION)
+        shutil.copyfile(chemin_cache, visualization_path)
+        st.session_state['visualisation_lda'] = visualization_path
+        st.success(f"Visualisation LDA sauvegardée dans {visualization_path}")
+
+    visualization_path = st.session_state.get('visualisation_lda')
+    if visualization_path is not None and os.path.exists(visualization_path):
+        with open(visualization_path, 'rb') as fichier:
+            st.download_button("Télécharger la visualisation (HTML)", fichier, file_name=FICHIER_VISUALISATION,
+                               mime="text/html")
+
+
+# Fonction pour afficher les paramètres du balayage du nombre de topics
+def parametres_balayage_topics():
+    with st.expander("Recherche du nombre de topics (cohérence)"):
+        actif = st.checkbox("Entraîner un modèle par nombre de topics et garder le plus cohérent", value=False)
+        k_min, k_max = st.slider("Plage du nombre de topics", 2, 50, (4, 20))
+        pas = st.number_input("Pas entre deux valeurs de k", min_value=1, max_value=10, value=2)
+        processus = st.number_input("Processus du balayage", min_value=1, max_value=NOMBRE_PROCESSUS_MAX,
+                                    value=NOMBRE_PROCESSUS_MAX, key="lda_balayage_processus")
+        critere = st.radio("Mesure de cohérence utilisée pour choisir k", COHERENCES, horizontal=True)
+    return {
+        'actif': actif,
+        'valeurs_k': list(range(k_min, k_max + 1, int(pas))),
+        'processus': int(processus),
+        'critere': critere,
+    }
+
+
+# Fonction pour entraîner le modèle LDA en affichant la durée et la perplexité de chaque passe
+def entrainement_suivi(corpus, dictionary, num_topics, passes, workers, save_directory):
+    zone_passes = st.empty()
+    suivi_passes = []
+
+    def afficher_passe(mesure):
+        suivi_passes.append(mesure)
+        zone_passes.dataframe(pd.DataFrame(suivi_passes), hide_index=True)
+
+    lda, mesures_passes = entrainer_lda(corpus, dictionary, num_topics, passes=passes, workers=workers,
+                                        progression=afficher_passe)
+    zone_passes.empty()
+    pd.DataFrame(mesures_passes).to_csv(os.path.join(save_directory, "lda_passes.csv"), index=False)
+    return lda, mesures_passes
+
+
+# Fonction pour lancer le balayage du nombre de topics, tracer la cohérence et charger le meilleur modèle
+def balayage_topics(dictionary, corpus, texts, save_directory, passes, parametres_balayage):
+    valeurs_k = parametres_balayage['valeurs_k']
+    barre = st.progress(0.0, text="Balayage du nombre de topics")
+    termines = []
+
+    def afficher_resultat(resultat):
+        termines.append(resultat['k'])
+        barre.progress(len(termines) / len(valeurs_k), text=f"k = {resultat['k']} terminé")
+
+    resultats = balayer_nombre_topics(valeurs_k, dictionary, corpus, texts, save_directory, passes=passes,
+                                      processus=parametres_balayage['processus'],
+                                      critere=parametres_balayage['critere'], progression=afficher_resultat)
+    df_coherence = pd.DataFrame(resultats)
+    df_coherence.drop(columns='chemin').to_csv(os.path.join(save_directory, "lda_coherence.csv"), index=False)
+
+    # Tracer la cohérence en fonction du nombre de topics
+    fig, axes = plt.subplots(1, len(COHERENCES), figsize=(14, 5))
+    for ax, coherence in zip(axes, COHERENCES):
+        ax.plot(df_coherence['k'], df_coherence[coherence], marker='o')
+        ax.set_title(f'Cohérence {coherence}')
+        ax.set_xlabel('Nombre de topics')
+    plt.savefig(os.path.join(save_directory, "lda_coherence.png"))
+    plt.close(fig)
+    barre.empty()
+
+    meilleur = max(resultats, key=lambda resultat: resultat[parametres_balayage['critere']])
+    return LdaModel.load(meilleur['chemin'])
+
+
+# Fonction pour exécuter une étape de l'analyse LDA en la mémorisant dans la session
+# La clé d'une étape dépend de celle de l'étape précédente et de ses propres paramètres : modifier un paramètre
+# ne recalcule que son étape et les suivantes
+def executer_etape(nom, cle_precedente, parametres, calcul):
+    cle = hashlib.sha256(repr((cle_precedente, parametres)).encode('utf-8')).hexdigest()
+    etapes = st.session_state.setdefault('etapes_lda', {})
+    if nom not in etapes or etapes[nom][0] != cle:
+        etapes[nom] = (cle, calcul())
+    return cle, etapes[nom][1]
+
+
+# Fonction pour filtrer une copie du dictionnaire et sérialiser le corpus sac-de-mots correspondant
+# Les textes avec bigrammes sont produits à la volée pendant l'écriture du corpus
+def filtrer_dictionnaire(dictionary, texts, bigram, no_below, no_above, save_directory):
+    dictionary = copy.deepcopy(dictionary)
+    dictionary.filter_extremes(no_below=no_below, no_above=no_above)
+    # Corpus sac-de-mots sérialisé sur disque (format Matrix Market) et relu en flux
+    corpus = serialiser_corpus(sacs_de_mots(texts, dictionary, bigram), save_directory)
+    return dictionary, corpus
+
+
+# Fonction pour entraîner le modèle (ou balayer le nombre de topics) puis enregistrer le modèle et ses exports
+def entrainer_et_exporter(dictionary, corpus, texts, bigram, save_directory, parametres):
+    if parametres['balayage']['actif']:
+        # Le meilleur modèle du balayage remplace l'entraînement avec le nombre de topics choisi
+        lda = balayage_topics(dictionary, corpus, textes_bigrammes(texts, bigram), save_directory,
+                              parametres['passes'], parametres['balayage'])
+        mesures_passes = None
+    else:
+        # Entraînement passe par passe (durée et perplexité affichées au fil de l'entraînement)
+        lda, mesures_passes = entrainement_suivi(corpus, dictionary, parametres['num_topics'], parametres['passes'],
+                                                 parametres['workers'], save_directory)
+
+    # Sauvegarde du modèle (rechargeable pour scorer ou intégrer de nouveaux documents)
+    enregistrer_modele(lda, dictionary, bigram, save_directory)
+    exporter_distributions(lda, corpus, os.path.join(save_directory, FICHIER_DISTRIBUTIONS))
+
+    # Exportation des résultats en CSV
+    topics_data = [{'Topic': topic_id + 1, 'Word': word, 'Probability': round(prob, 4)}
+                   for topic_id, topic_words in
+                   lda.show_topics(formatted=False, num_topics=lda.num_topics, num_words=10)
+                   for word, prob in topic_words]
+    df_topics = pd.DataFrame(topics_data)
+    df_topics.to_csv(os.path.join(save_directory, "lda_topics.csv"), index=False)
+
+    # Nuages de mots (enregistrés une fois, réaffichés depuis les fichiers à chaque rerun)
+    for topic_num, topic_words in lda.show_topics(formatted=False, num_topics=lda.num_topics, num_words=20):
+        wordcloud = WordCloud(width=800, height=560, background_color='white').generate_from_frequencies(
+            dict(topic_words))
+        wordcloud.to_file(os.path.join(save_directory, f"topic_{topic_num + 1}_wordcloud.png"))
+
+    return {'num_topics': lda.num_topics, 'mesures_passes': mesures_passes,
+            'balayage': parametres['balayage']['actif']}
+
+
+# Fonction pour obtenir les paramètres qui déterminent le modèle entraîné (clé de l'étape d'entraînement)
+# Le nombre de processus du balayage ne change que la répartition du calcul, pas les modèles
+def parametres_entrainement(parametres):
+    balayage = parametres['balayage']
+    if balayage['actif']:
+        return 'balayage', parametres['passes'], tuple(balayage['valeurs_k']), balayage['critere']
+    return 'entrainement', parametres['num_topics'], parametres['passes'], parametres['workers']
+
+
+# Fonction pour enchaîner les étapes de l'analyse LDA (annotation, bigrammes, dictionnaire, filtrage,
+# entraînement) ; chaque étape est mémorisée sur ses paramètres
+def executer_analyse_lda(uploaded_file, empreinte_fichier, save_directory, parametres):
+    # Seuls les tokens filtrés sont mémorisés : le fichier est relu en flux et les articles déjà annotés
+    # sont relus depuis le cache, sans SpaCy
+    cle, texts = executer_etape(
+        'annotation', None,
+        (empreinte_fichier, sorted(parametres['pos_filter']), sorted(parametres['custom_stopwords'])),
+        lambda: list(textes_tokenises(extraire_articles(uploaded_file), parametres['pos_filter'],
+                                      parametres['custom_stopwords'], parametres['batch_size'],
+                                      parametres['n_process'])))
+    st.write(f"Nombre d'articles traités : {len(texts)}")
+
+    # Seule la liste des tokens filtrés est gardée en mémoire : les textes avec bigrammes sont produits à la volée
+    # par chacune des étapes suivantes
+    with st.spinner("Détection des bigrammes..."):
+        cle_annotation = cle
+        cle, bigram = executer_etape('bigrammes', cle, None, lambda: detecter_bigrammes(texts, cle_annotation))
+
+    with st.spinner("Création du dictionnaire..."):
+        cle, dictionary = executer_etape('dictionnaire', cle, None,
+                                         lambda: corpora.Dictionary(textes_bigrammes(texts, bigram)))
+
+    with st.spinner("Filtrage du dictionnaire et sérialisation du corpus..."):
+        cle, (dictionary_filtre, corpus) = executer_etape(
+            'filtrage', cle, (parametres['no_below'], parametres['no_above'], save_directory),
+            lambda: filtrer_dictionnaire(dictionary, texts, bigram, parametres['no_below'], parametres['no_above'],
+                                         save_directory))
+
+    cle, resultat = executer_etape(
+        'entrainement', cle, parametres_entrainement(parametres),
+        lambda: entrainer_et_exporter(dictionary_filtre, corpus, texts, bigram, save_directory, parametres))
+    return resultat
+
+
+# Fonction pour afficher les résultats de l'entraînement à partir des fichiers exportés
+def afficher_resultats_lda(resultat, save_directory):
+    if resultat['balayage']:
+        st.image(os.path.join(save_directory, "lda_coherence.png"))
+        st.success(f"Nombre de topics retenu : {resultat['num_topics']}")
+    elif resultat['mesures_passes']:
+        st.write("Durée et perplexité de chaque passe :")
+        st.dataframe(pd.DataFrame(resultat['mesures_passes']), hide_index=True)
+
+    st.success(f"Modèle enregistré ; topics et distributions des topics par document sauvegardés dans "
+               f"{save_directory}")
+
+    # Nuages de mots
+    st.write("Nuages de mots pour chaque topic:")
+    for topic_num in range(resultat['num_topics']):
+        st.image(os.path.join(save_directory, f"topic_{topic_num + 1}_wordcloud.png"),
+                 caption=f"Topic #{topic_num + 1}")
+
+
 # Fonction principale pour l'interface Streamlit LDA
 def afficher_interface_lda():
     st.title("Analyse LDA (Latent Dirichlet Allocation)")
@@ -88,102 +341,58 @@ def afficher_interface_lda():
         )
         custom_stopwords = set(custom_stopwords_input.split())
 
-        # Bouton pour lancer le test LDA
-        if st.button("Lancer l'analyse LDA"):
-            # Lecture des données et prétraitement
-            articles = []
-            file_content = uploaded_file.getvalue().decode("utf-8").splitlines()
-            article_content = []
-            progress_bar = st.progress(0)
-
-            for line in file_content:
-                if line.startswith('****'):
-                    if article_content:
-                        preprocessed_text = ' '.join(preprocess_text(" ".join(article_content), pos_filter=pos_filter,
-                                                                     custom_stopwords=custom_stopwords))
-                        articles.append(preprocessed_text)
-                        article_content = []
-                else:
-                    article_content.append(line.strip())
-            if article_content:
-                preprocessed_text = ' '.join(preprocess_text(" ".join(article_content), pos_filter=pos_filter,
-                                                             custom_stopwords=custom_stopwords))
-                articles.append(preprocessed_text)
-
-            st.write(f"Nombre d'articles traités : {len(articles)}")
-
-            # Mise à jour de la barre de progression
-            progress_bar.progress(20)
-
-            # Transformation des articles en listes de mots pour la détection des bigrammes
-            texts = [article.split() for article in articles]
-            phrases = Phrases(texts, min_count=5, threshold=10)
-            bigram = Phraser(phrases)
-            texts_with_bigrams = [bigram[text] for text in texts]
-
-            # Mise à jour de la barre de progression
-            progress_bar.progress(40)
-
-            # Création du dictionnaire et du corpus pour LDA, utilisant les textes avec bigrammes
-            dictionary = corpora.Dictionary(texts_with_bigrams)
-
-            # Filtrage des termes rares ou trop fréquents
-            no_below = st.slider("Exclure les termes rares (minimum occurrences)", 0, 5, 0)
-            no_above = st.slider("Exclure les termes fréquents (fraction maximum)", 0.1, 1.0, 0.6)
-            dictionary.filter_extremes(no_below=no_below, no_above=no_above)
-
-            corpus = [dictionary.doc2bow(text) for text in texts_with_bigrams]
-
-            # Mise à jour de la barre de progression
-            progress_bar.progress(60)
-
-            # Paramètres LDA
-            num_topics = st.slider("Nombre de topics à extraire:", 2, 20, 12)
-
-            # Application de LDA
-            lda = LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=15)
-
-            # Mise à jour de la barre de progression
-            progress_bar.progress(80)
-
-            # Préparation des données pour la visualisation LDA
-            lda_display = gensimvis.prepare(lda, corpus, dictionary, sort_topics=False)
-
-            # Sauvegarde des résultats
-            visualization_path = os.path.join(save_directory, "lda_visualization.html")
-            pyLDAvis.save_html(lda_display, visualization_path)
-            st.success(f"Visualisation LDA sauvegardée dans {visualization_path}")
-
-            # Mise à jour de la barre de progression
-            progress_bar.progress(100)
-
-            # Affichage de la visualisation LDA directement dans Streamlit
-            st.markdown("### Visualisation LDA")
-            with open(visualization_path, 'r') as file:
-                lda_html = file.read()
-            html(lda_html, height=800)
-
-            # Exportation des résultats en CSV
-            topics_data = [{'Topic': topic_id + 1, 'Word': word, 'Probability': round(prob, 4)}
-                           for topic_id, topic_words in
-                           lda.show_topics(formatted=False, num_topics=num_topics, num_words=10)
-                           for word, prob in topic_words]
-            df_topics = pd.DataFrame(topics_data)
-            csv_path = os.path.join(save_directory, "lda_topics.csv")
-            df_topics.to_csv(csv_path, index=False)
-            st.success(f"Les topics ont été sauvegardés dans {csv_path}")
-
-            # Nuages de mots
-            st.write("Nuages de mots pour chaque topic:")
-            for topic_num, topic_words in lda.show_topics(formatted=False, num_topics=num_topics, num_words=20):
-                plt.figure(figsize=(10, 7))
-                plt.title(f"Topic #{topic_num + 1}")
-                dict_words = dict(topic_words)
-                wordcloud = WordCloud(width=800, height=560, background_color='white').generate_from_frequencies(
-                    dict_words)
-                plt.imshow(wordcloud, interpolation='bilinear')
-                plt.axis("off")
-                st.pyplot(plt)
-                wordcloud.to_file(os.path.join(save_directory, f"topic_{topic_num + 1}_wordcloud.png"))
+        # Taille des lots et nombre de processus pour l'annotation SpaCy
+        batch_size, n_process = parametres_annotation()
+
+        # Filtrage des termes rares ou trop fréquents
+        no_below = st.slider("Exclure les termes rares (minimum occurrences)", 0, 5, 0)
+        no_above = st.slider("Exclure les termes fréquents (fraction maximum)", 0.1, 1.0, 0.6)
 
+        # Paramètres LDA
+        num_topics = st.slider("Nombre de topics à extraire:", 2, 20, 12)
 
+        # Paramètres de l'entraînement (le corpus sac-de-mots est relu depuis le disque à chaque passe)
+        with st.expander("Paramètres de l'entraînement LDA"):
+            passes = st.slider("Nombre de passes sur le corpus", 1, 50, 15)
+            workers = st.number_input("Nombre de workers (1 = LdaModel, plus = LdaMulticore)", min_value=1,
+                                      max_value=NOMBRE_PROCESSUS_MAX, value=max(1, NOMBRE_PROCESSUS_MAX - 1))
+
+        # Balayage du nombre de topics : un modèle par valeur de k, entraînés en parallèle
+        parametres_balayage = parametres_balayage_topics()
+
+        # Bouton pour lancer le test LDA ; une fois lancée, l'analyse suit les paramètres à chaque rerun
+        # et seules les étapes dont les paramètres ont changé sont recalculées
+        empreinte_fichier = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if st.button("Lancer l'analyse LDA"):
+            st.session_state['lda_fichier'] = empreinte_fichier
+
+        if st.session_state.get('lda_fichier') == empreinte_fichier:
+            parametres = {
+                'pos_filter': pos_filter,
+                'custom_stopwords': custom_stopwords,
+                'batch_size': batch_size,
+                'n_process': n_process,
+                'no_below': no_below,
+                'no_above': no_above,
+                'num_topics': num_topics,
+                'passes': passes,
+                'workers': int(workers),
+                'balayage': parametres_balayage,
+            }
+            resultat = executer_analyse_lda(uploaded_file, empreinte_fichier, save_directory, parametres)
+            afficher_resultats_lda(resultat, save_directory)
+
+        # Modèle enregistré lors d'une analyse précédente : les articles du fichier sont scorés sans réentraînement
+        if modele_enregistre(save_directory):
+            st.markdown("### Modèle LDA enregistré")
+            st.write(f"Un modèle est enregistré dans {save_directory}. Les articles du fichier peuvent être intégrés "
+                     "au modèle (apprentissage en ligne) ou simplement scorés avec ses topics.")
+            colonne_mise_a_jour, colonne_inference = st.columns(2)
+            mettre_a_jour = colonne_mise_a_jour.button("Mettre à jour le modèle avec ce fichier")
+            inferer = colonne_inference.button("Exporter les topics de ce fichier avec le modèle enregistré")
+            if mettre_a_jour or inferer:
+                texts = list(textes_tokenises(extraire_articles(uploaded_file), pos_filter, custom_stopwords,
+                                              batch_size, n_process))
+                appliquer_modele_enregistre(texts, save_directory, mettre_a_jour)
+
+            afficher_visualisation_lda(save_directory)
@@ -0,0 +1,345 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+import numpy as np
+import pandas as pd
+from gensim.corpora import Dictionary, MmCorpus
+from gensim.models.coherencemodel import CoherenceModel
+from gensim.models.ldamodel import LdaModel
+from gensim.models.ldamulticore import LdaMulticore
+from gensim.models.phrases import Phrases, Phraser
+from cache_disque import NOMBRE_PROCESSUS_MAX, ecrire_atomique, repertoire_cache
+
+# Visualisation interactive optionnelle (pip install pyLDAvis)
+try:
+    import pyLDAvis
+except ImportError:
+    pyLDAvis = None
+
+# Fichier du corpus sac-de-mots sérialisé (format Matrix Market, relu en flux à chaque passe)
+FICHIER_CORPUS_MM = "lda_corpus.mm"
+
+# Fichiers du modèle enregistré (le dictionnaire est aussi partagé avec les processus du balayage)
+FICHIER_MODELE = "lda_modele.model"
+FICHIER_DICTIONNAIRE = "lda_dictionnaire.dict"
+FICHIER_PHRASES = "lda_phrases.model"
+FICHIER_DISTRIBUTIONS = "lda_document_topics.csv"
+FICHIER_VISUALISATION = "lda_visualization.html"
+FICHIER_TEXTES = "lda_textes.txt"
+REPERTOIRE_BALAYAGE = "balayage_topics"
+
+# Mesures de cohérence calculées pour chaque nombre de topics
+COHERENCES = ('c_v', 'u_mass')
+
+# Paramètres de la détection des bigrammes
+MIN_COUNT_BIGRAMMES = 5
+SEUIL_BIGRAMMES = 10
+
+# Nombre de documents utilisés pour mesurer la perplexité après chaque passe
+DOCUMENTS_PERPLEXITE = 2000
+
+# Nombre de documents inférés à la fois lors de l'export des distributions de topics
+TAILLE_LOT_INFERENCE = 2000
+
+# Paramètres par défaut de la visualisation pyLDAvis
+TERMES_VISUALISATION = 30
+VOCABULAIRE_VISUALISATION = 5000
+
+
+# Fonction pour détecter les bigrammes en un seul passage sur les textes et figer le modèle obtenu
+# Le modèle figé est conservé sur disque avec la clé du corpus (textes annotés et filtrés)
+def detecter_bigrammes(texts, cle_corpus, min_count=MIN_COUNT_BIGRAMMES, threshold=SEUIL_BIGRAMMES):
+    chemin = os.path.join(repertoire_cache('phrases'), f"{cle_corpus}_min{min_count}_seuil{threshold}.model")
+    if os.path.exists(chemin):
+        return Phraser.load(chemin)
+    bigram = Phraser(Phrases(texts, min_count=min_count, threshold=threshold))
+    ecrire_atomique(chemin, bigram.save)
+    return bigram
+
+
+# Fonction pour produire à la demande les textes avec bigrammes (aucune copie du corpus n'est conservée)
+def textes_bigrammes(texts, bigram):
+    for text in texts:
+        yield bigram[text]
+
+
+# Fonction pour sérialiser un flux de sacs-de-mots sur disque et le rouvrir en lecture en flux
+def serialiser_corpus(bows, repertoire):
+    chemin = os.path.join(repertoire, FICHIER_CORPUS_MM)
+    MmCorpus.serialize(chemin, bows)
+    return MmCorpus(chemin)
+
+
+# Fonction pour créer un modèle LDA entraîné sur une seule passe (multicœur si workers > 1)
+def creer_lda(corpus, dictionary, num_topics, workers=1, random_state=42):
+    if workers > 1:
+        return LdaMulticore(corpus, num_topics=num_topics, id2word=dictionary, passes=1, workers=workers,
+                            random_state=random_state)
+    return LdaModel(corpus, num_topics=num_topics, id2word=dictionary, passes=1, random_state=random_state)
+
+
+# Fonction pour entraîner un modèle LDA passe par passe en mesurant la durée et la perplexité de chaque passe
+# progression : fonction appelée après chaque passe avec le dictionnaire des mesures de la passe
+# Renvoie le modèle et la liste des mesures
+def entrainer_lda(corpus, dictionary, num_topics, passes=15, workers=1, progression=None,
+                  documents_perplexite=DOCUMENTS_PERPLEXITE):
+    echantillon = list(islice(corpus, documents_perplexite))
+    mesures = []
+    lda = None
+    for passe in range(1, passes + 1):
+        debut = time.perf_counter()
+        if lda is None:
+            lda = creer_lda(corpus, dictionary, num_topics, workers)
+        else:
+            # Les deux classes reprennent passes=1 fixé à la création du modèle
+            lda.update(corpus)
+        duree = time.perf_counter() - debut
+
+        # log_perplexity renvoie une borne par mot : perplexité = 2^(-borne)
+        borne = lda.log_perplexity(echantillon)
+        mesure = {'Passe': passe, 'Durée (s)': round(duree, 2), 'Perplexité': float(np.exp2(-borne))}
+        mesures.append(mesure)
+        if progression is not None:
+            progression(mesure)
+    return lda, mesures
+
+
+# Fonction pour écrire les textes tokenisés (un document par ligne) pour la cohérence c_v des processus
+def enregistrer_textes(textes, repertoire):
+    chemin = os.path.join(repertoire, FICHIER_TEXTES)
+    with open(chemin, 'w', encoding='utf-8') as fichier:
+        fichier.writelines(' '.join(texte) + '\n' for texte in textes)
+    return chemin
+
+
+# Fonction pour relire les textes tokenisés écrits par enregistrer_textes
+def lire_textes(chemin):
+    with open(chemin, 'r', encoding='utf-8') as fichier:
+        return [ligne.split() for ligne in fichier]
+
+
+# Fonction exécutée dans un processus du balayage : entraîne un modèle à k topics et mesure sa cohérence
+# Le dictionnaire, le corpus et les textes sont relus depuis le disque (rien n'est copié depuis le processus parent)
+def evaluer_nombre_topics(k, chemin_dictionnaire, chemin_corpus, chemin_textes, passes, repertoire_modeles):
+    dictionary = Dictionary.load(chemin_dictionnaire)
+    corpus = MmCorpus(chemin_corpus)
+    texts = lire_textes(chemin_textes)
+
+    debut = time.perf_counter()
+    lda = LdaModel(corpus, num_topics=k, id2word=dictionary, passes=passes, random_state=42)
+    resultat = {'k': k, 'Durée (s)': round(time.perf_counter() - debut, 2)}
+    for coherence in COHERENCES:
+        modele_coherence = CoherenceModel(model=lda, texts=texts, corpus=corpus, dictionary=dictionary,
+                                          coherence=coherence, processes=1)
+        resultat[coherence] = float(modele_coherence.get_coherence())
+
+    resultat['chemin'] = os.path.join(repertoire_modeles, f"lda_k{k}.model")
+    lda.save(resultat['chemin'])
+    return resultat
+
+
+# Fonction pour entraîner en parallèle un modèle par nombre de topics et garder les meilleurs
+# progression : fonction appelée avec chaque résultat dès qu'un processus termine
+# Renvoie les résultats triés par k ; seuls les modèles des `garder` meilleurs scores (critère) restent sur disque
+def balayer_nombre_topics(valeurs_k, dictionary, corpus, textes, repertoire, passes=10, processus=NOMBRE_PROCESSUS_MAX,
+                          critere='c_v', garder=3, progression=None):
+    chemin_dictionnaire = os.path.join(repertoire, FICHIER_DICTIONNAIRE)
+    dictionary.save(chemin_dictionnaire)
+    chemin_textes = enregistrer_textes(textes, repertoire)
+    # Les modèles d'un balayage précédent sont remplacés
+    repertoire_modeles = os.path.join(repertoire, REPERTOIRE_BALAYAGE)
+    shutil.rmtree(repertoire_modeles, ignore_errors=True)
+    os.makedirs(repertoire_modeles)
+
+    resultats = []
+    with ProcessPoolExecutor(max_workers=min(processus, len(valeurs_k))) as executeur:
+        taches = [executeur.submit(evaluer_nombre_topics, k, chemin_dictionnaire, corpus.input, chemin_textes, passes,
+                                   repertoire_modeles)
+                  for k in valeurs_k]
+        for tache in as_completed(taches):
+            resultats.append(tache.result())
+            if progression is not None:
+                progression(resultats[-1])
+
+    # u_mass est négative : plus elle est proche de 0, meilleur est le modèle ; c_v : plus elle est haute, mieux c'est
+    classement = sorted(resultats, key=lambda resultat: resultat[critere], reverse=True)
+    for resultat in classement[garder:]:
+        for fichier in os.listdir(repertoire_modeles):
+            if fichier.startswith(os.path.basename(resultat['chemin'])):
+                os.remove(os.path.join(repertoire_modeles, fichier))
+        resultat['chemin'] = None
+    return sorted(resultats, key=lambda resultat: resultat['k'])
+
+
+# Fonction pour enregistrer le modèle LDA, son dictionnaire et le modèle de bigrammes dans un répertoire
+def enregistrer_modele(lda, dictionary, bigram, repertoire):
+    lda.save(os.path.join(repertoire, FICHIER_MODELE))
+    dictionary.save(os.path.join(repertoire, FICHIER_DICTIONNAIRE))
+    bigram.save(os.path.join(repertoire, FICHIER_PHRASES))
+
+
+# Fonction pour indiquer si un modèle complet est enregistré dans un répertoire
+def modele_enregistre(repertoire):
+    return all(os.path.exists(os.path.join(repertoire, fichier))
+               for fichier in (FICHIER_MODELE, FICHIER_DICTIONNAIRE, FICHIER_PHRASES))
+
+
+# Fonction pour recharger le modèle LDA, son dictionnaire et le modèle de bigrammes
+def charger_modele(repertoire):
+    lda = LdaModel.load(os.path.join(repertoire, FICHIER_MODELE))
+    dictionary = Dictionary.load(os.path.join(repertoire, FICHIER_DICTIONNAIRE))
+    bigram = Phraser.load(os.path.join(repertoire, FICHIER_PHRASES))
+    return lda, dictionary, bigram
+
+
+# Fonction pour convertir des textes tokenisés en sacs-de-mots avec le vocabulaire d'un modèle existant
+# (les mots absents du dictionnaire sont ignorés : le vocabulaire d'un modèle LDA est figé)
+def sacs_de_mots(textes, dictionary, bigram):
+    for texte in textes_bigrammes(textes, bigram):
+        yield dictionary.doc2bow(texte)
+
+
+# Fonction pour intégrer de nouveaux documents à un modèle existant par apprentissage en ligne
+def mettre_a_jour_modele(lda, dictionary, bigram, textes, passes=1):
+    bows = list(sacs_de_mots(textes, dictionary, bigram))
+    for _ in range(passes):
+        lda.update(bows)
+    return len(bows)
+
+
+# Fonction pour calculer l'empreinte d'un document sac-de-mots (les comptes sont arrondis à l'entier)
+def empreinte_document(empreinte, bow):
+    paires = np.asarray(bow, dtype=np.float64).reshape(-1, 2).astype(np.int64)
+    empreinte.update(len(paires).to_bytes(8, 'little'))
+    empreinte.update(paires.tobytes())
+
+
+# Fonction pour obtenir le chemin de la signature (modèle et corpus) d'un fichier de distributions
+def chemin_signature(chemin_distributions):
+    return f"{chemin_distributions}.signature"
+
+
+# Fonction pour exporter la distribution des topics de chaque document, par lots de documents
+# Renvoie le chemin du CSV (une ligne par document, une colonne par topic et le topic dominant)
+# La signature du modèle et du corpus est écrite à côté : les distributions ne sont réutilisées que pour eux
+def exporter_distributions(lda, bows, chemin, taille_lot=TAILLE_LOT_INFERENCE):
+    colonnes = [f'Topic {numero + 1}' for numero in range(lda.num_topics)]
+    bows = iter(bows)
+    empreinte = hashlib.sha256()
+    premier_document = 1
+    if os.path.exists(chemin_signature(chemin)):
+        os.remove(chemin_signature(chemin))
+    with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+        while lot := list(islice(bows, taille_lot)):
+            for bow in lot:
+                empreinte_document(empreinte, bow)
+            gamma, _ = lda.inference(lot)
+            distributions = gamma / gamma.sum(axis=1, keepdims=True)
+            df_lot = pd.DataFrame(distributions.round(4), columns=colonnes)
+            df_lot.insert(0, 'Document', range(premier_document, premier_document + len(lot)))
+            df_lot['Topic dominant'] = distributions.argmax(axis=1) + 1
+            df_lot.to_csv(fichier, index=False, header=(premier_document == 1))
+            premier_document += len(lot)
+    with open(chemin_signature(chemin), 'w', encoding='ascii') as fichier:
+        fichier.write(f"{signature_modele(lda)}|{empreinte.hexdigest()}")
+    return chemin
+
+
+# Fonction pour calculer la signature d'un modèle entraîné (clé du cache des visualisations)
+def signature_modele(lda):
+    return hashlib.sha256(np.ascontiguousarray(lda.get_topics()).tobytes()).hexdigest()
+
+
+# Fonction pour calculer en un passage la longueur des documents, la fréquence des termes et l'empreinte du corpus
+def statistiques_corpus(corpus, nombre_termes):
+    longueurs = []
+    frequences = np.zeros(nombre_termes, dtype=np.float64)
+    empreinte = hashlib.sha256()
+    for bow in corpus:
+        empreinte_document(empreinte, bow)
+        paires = np.asarray(bow, dtype=np.float64).reshape(-1, 2)
+        np.add.at(frequences, paires[:, 0].astype(np.int64), paires[:, 1])
+        longueurs.append(paires[:, 1].sum())
+    return np.array(longueurs), frequences, empreinte.hexdigest()
+
+
+# Fonction pour relire les distributions exportées par exporter_distributions (évite une seconde inférence)
+# None si le fichier n'a pas été produit par ce modèle sur ce corpus
+def lire_distributions(chemin, signature):
+    if not os.path.exists(chemin) or not os.path.exists(chemin_signature(chemin)):
+        return None
+    with open(chemin_signature(chemin), 'r', encoding='ascii') as fichier:
+        if fichier.read().strip() != signature:
+            return None
+    distributions = pd.read_csv(chemin).filter(like='Topic ').drop(columns='Topic dominant').to_numpy()
+    # Les valeurs exportées sont arrondies : chaque ligne est renormalisée
+    return distributions / distributions.sum(axis=1, keepdims=True)
+
+
+# Fonction pour inférer la distribution des topics de chaque document du corpus, par lots de documents
+def inferer_distributions(lda, corpus, taille_lot=TAILLE_LOT_INFERENCE):
+    bows = iter(corpus)
+    distributions = []
+    while lot := list(islice(bows, taille_lot)):
+        gamma, _ = lda.inference(lot)
+        distributions.append(gamma / gamma.sum(axis=1, keepdims=True))
+    return np.vstack(distributions) if distributions else np.empty((0, lda.num_topics))
+
+
+# Fonction pour limiter les données de la visualisation aux termes les plus fréquents du corpus
+# Les termes absents du corpus sont toujours retirés
+def limiter_vocabulaire(donnees, vocabulaire_max):
+    gardes = np.flatnonzero(donnees['term_frequency'] > 0)
+    if len(gardes) > vocabulaire_max:
+        gardes = np.sort(gardes[np.argsort(donnees['term_frequency'][gardes])[::-1][:vocabulaire_max]])
+    topic_term = donnees['topic_term_dists'][:, gardes]
+    return dict(donnees,
+                topic_term_dists=topic_term / topic_term.sum(axis=1, keepdims=True),
+                vocab=donnees['vocab'][gardes],
+                term_frequency=donnees['term_frequency'][gardes])
+
+
+# Fonction pour préparer la visualisation pyLDAvis d'un modèle, mise en cache par modèle, corpus et paramètres
+# Les tableaux attendus par pyLDAvis.prepare sont calculés ici : distributions topics-termes du modèle,
+# distributions documents-topics (relues si elles ont été exportées pour ce modèle et ce corpus, sinon inférées),
+# longueurs des documents et fréquences des termes
+# Renvoie le chemin du fichier HTML dans le cache (None si pyLDAvis n'est pas installé)
+def preparer_visualisation(lda, corpus, dictionary, chemin_distributions=None, R=TERMES_VISUALISATION,
+                           vocabulaire_max=VOCABULAIRE_VISUALISATION, n_jobs=-1):
+    if pyLDAvis is None:
+        return None
+    topic_term = lda.get_topics()
+    longueurs, frequences, empreinte_corpus = statistiques_corpus(corpus, topic_term.shape[1])
+    signature = f"{signature_modele(lda)}|{empreinte_corpus}"
+    nom = hashlib.sha256(signature.encode('ascii')).hexdigest()
+    chemin = os.path.join(repertoire_cache('pyldavis'), f"{nom}_R{R}_voc{vocabulaire_max}.html")
+    if os.path.exists(chemin):
+        return chemin
+
+    distributions = lire_distributions(chemin_distributions, signature) if chemin_distributions else None
+    if distributions is None:
+        distributions = inferer_distributions(lda, corpus)
+    donnees = limiter_vocabulaire({
+        'topic_term_dists': topic_term,
+        'doc_topic_dists': distributions,
+        'doc_lengths': longueurs,
+        'vocab': np.array([dictionary[identifiant] for identifiant in range(topic_term.shape[1])], dtype=object),
+        'term_frequency': frequences,
+    }, vocabulaire_max)
+    lda_display = pyLDAvis.prepare(**donnees, R=R, n_jobs=n_jobs, sort_topics=False)
+    ecrire_atomique(chemin, lambda fichier: pyLDAvis.save_html(lda_display, fichier), mode='w')
+    return chemin
@@ -9,24 +9,14 @@
 # Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
 ##########################################
 
+import time
+
+debut_demarrage = time.perf_counter()
+
 from config import *  # Importer la configuration de la page
 from streamlit_option_menu import option_menu
-from kmeans import afficher_interface_kmeans  # Importer seulement l'interface K-Means
-# from cah import analyse_cah
-from cah import afficher_interface_cah
-from tfidf import afficher_interface_tfidf
-from europresse import afficher_interface_europresse
-from pdf_traitement import traitement_pdf
-from gestion_doublons import afficher_interface_recherche_doublons
-from lda import afficher_interface_lda
-from scraper import afficher_interface_scraper_youtube_comments
-from analyse_cooccurrences import afficher_interface_cooccurrences
-from youtube_transcription import afficher_interface_youtube_transcription
-from mp4tomp3 import afficher_interface_mp4_to_mp3
-from html_to_text import afficher_interface_html_to_text
-from france_inter_audio import afficher_interface_france_inter_audio
-from mp3_to_text import afficher_interface_audio_to_text_whisper
-from faq import afficher_faq
+# Les pages d'analyse sont importées à la demande (voir chargement_pages.PAGES)
+from chargement_pages import afficher_page, afficher_rapport_imports
 import os
 
 # Configuration de la page est déjà gérée dans config.py
@@ -86,42 +76,42 @@ elif selected == "Data":
     )
 
     if prep_option == "Europresse html to text":
-        afficher_interface_europresse()
+        afficher_page("Europresse html to text")
 
     elif prep_option == "PDF to Text":
-        traitement_pdf()
+        afficher_page("PDF to Text")
 
-    elif prep_option == "Recherche de doublons":
-        afficher_interface_recherche_doublons()
+    elif prep_option == "Search doublons":
+        afficher_page("Search doublons")
 
     elif prep_option == "MP4 to MP3":
-        afficher_interface_mp4_to_mp3()
+        afficher_page("MP4 to MP3")
 
     elif prep_option == "Youtube to Text":
-        afficher_interface_youtube_transcription()
+        afficher_page("Youtube to Text")
 
     elif prep_option == "MP3 to Text":
-        afficher_interface_audio_to_text_whisper()
+        afficher_page("MP3 to Text")
 
 # Cooccurrences
 elif selected == "Cooccu":
-    afficher_interface_cooccurrences()
+    afficher_page("Cooccu")
 
 # K-Means
 elif selected == "K-Means":
-    afficher_interface_kmeans()
+    afficher_page("K-Means")
 
 # CAH
 elif selected == "CAH":
-    afficher_interface_cah()
+    afficher_page("CAH")
 
 # TF-IDF
 elif selected == "TF-IDF":
-    afficher_interface_tfidf()
+    afficher_page("TF-IDF")
 
 # LDA
 elif selected == "LDA":
-    afficher_interface_lda()
+    afficher_page("LDA")
 
 # SCRAPER
 elif selected == "Scraper":
@@ -132,19 +122,21 @@ elif selected == "Scraper":
     )
 
     if scraper_option == "Scraper les commentaires YouTube":
-        afficher_interface_scraper_youtube_comments()
+        afficher_page("Scraper les commentaires YouTube")
 
     elif scraper_option == "HTML to Text":
-        afficher_interface_html_to_text()
+        afficher_page("HTML to Text")
 
     elif scraper_option == "Audio France Inter":
-        afficher_interface_france_inter_audio()
+        afficher_page("Audio France Inter")
 
 # France Inter Audio
 elif selected == "Audio France Inter":
-    afficher_interface_france_inter_audio()
+    afficher_page("Audio France Inter")
 
 # FAQ
 elif selected == "FAQ":
-    afficher_faq()
+    afficher_page("FAQ")
 
+# Rapport des temps de chargement (démarrage et import de chaque page)
+afficher_rapport_imports(time.perf_counter() - debut_demarrage)
@@ -0,0 +1,54 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import os
+import joblib
+import streamlit as st
+from sklearn.decomposition import PCA
+from sklearn.pipeline import make_pipeline
+from umap import UMAP
+from cache_disque import repertoire_cache
+
+
+# Fonction pour créer le modèle de projection 2D (PCA optionnelle puis UMAP)
+def creer_modele_projection(dimension, composantes_pca=0):
+    etapes = []
+    if 0 < composantes_pca < dimension:
+        etapes.append(PCA(n_components=composantes_pca, random_state=42))
+    etapes.append(UMAP(n_components=2, random_state=42))
+    return make_pipeline(*etapes)
+
+
+# Fonction pour calculer une seule fois la projection 2D des documents d'un corpus
+# Le modèle ajusté et les coordonnées sont conservés sur disque avec la signature du corpus
+def calculer_projection(embeddings, signature, composantes_pca=0):
+    chemin = os.path.join(repertoire_cache('projections'), f"{signature}_pca{composantes_pca}.joblib")
+    if os.path.exists(chemin):
+        return joblib.load(chemin)
+
+    with st.spinner("Calcul de la projection UMAP..."):
+        modele = creer_modele_projection(embeddings.shape[1], composantes_pca)
+        coordonnees = modele.fit_transform(embeddings)
+    joblib.dump((modele, coordonnees), chemin)
+    return modele, coordonnees
+
+
+# Fonction pour projeter de nouveaux vecteurs (centroïdes, nouveaux documents) dans le plan existant
+def projeter(modele, vecteurs):
+    return modele.transform(vecteurs)
+
+
+# Fonction pour afficher les paramètres de la projection
+def parametres_projection():
+    with st.expander("Paramètres de la projection UMAP"):
+        composantes_pca = st.number_input("Pré-réduction PCA avant UMAP (nombre de composantes, 0 = aucune)",
+                                          min_value=0, max_value=1024, value=0)
+    return int(composantes_pca)
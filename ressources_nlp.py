@@ -0,0 +1,32 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import spacy
+import streamlit as st
+
+# Modèle SpaCy partagé par les pages TF-IDF et LDA
+MODELE_SPACY = 'fr_core_news_lg'
+
+# Composants utiles : le lemmatiseur français s'appuie sur les étiquettes POS du morphologizer,
+# qui servent aussi au filtre POS de la LDA
+COMPOSANTS_LEMMES = ('tok2vec', 'morphologizer', 'attribute_ruler', 'lemmatizer')
+
+# Composants jamais utilisés par l'application (non chargés en mémoire)
+COMPOSANTS_EXCLUS = ('parser', 'ner')
+
+
+# Fonction pour charger une seule fois le modèle SpaCy pour tout le processus (reruns et sessions)
+@st.cache_resource(show_spinner="Chargement du modèle SpaCy...")
+def charger_nlp(modele=MODELE_SPACY):
+    nlp = spacy.load(modele, exclude=list(COMPOSANTS_EXCLUS))
+    nlp.max_length = 8000000  # Augmenter la limite de caractères
+    return nlp
+
@@ -12,28 +12,98 @@
 
 import streamlit as st
 import re
-import spacy
 from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
+from scipy import sparse
 import pandas as pd
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 import os
+from spacy.lang.fr.stop_words import STOP_WORDS
+from ressources_nlp import charger_nlp
+from tfidf_incremental import (MODE_HACHAGE, MODE_VOCABULAIRE, NOMBRE_COLONNES_HACHAGE, ajouter_documents,
+                               reinitialiser_etat)
+from annotation import (annoter_avec_cache, formes_tokens, lemmes_tokens, parametres_annotation,
+                        progression_streamlit)
 
-# Chargement du modèle français de SpaCy
-nlp = spacy.load('fr_core_news_lg')
-nlp.max_length = 8000000  # Augmenter la limite de caractères
 
-
-# Fonction pour lemmatiser le texte et retirer les stopwords
-def lemmatize_and_remove_stopwords(text, nlp, stopwords):
-    doc = nlp(text)
-    lemmatized_text = " ".join(
-        [token.lemma_ for token in doc if token.text.lower() not in stopwords and not token.is_punct]
-    )
+# Fonction pour lemmatiser un article annoté (annotation en cache) et retirer les stopwords
+def lemmatiser_annotation(annotation, stopwords):
+    indices = np.flatnonzero(~annotation['is_punct'])
+    indices = [i for i, forme in zip(indices, formes_tokens(annotation, indices)) if forme.lower() not in stopwords]
+    lemmatized_text = " ".join(lemmes_tokens(annotation, indices))
     return lemmatized_text
 
 
+# Formats d'export des scores TF-IDF (jamais de CSV dense avec une colonne par terme)
+EXPORT_LONG = "CSV long (document, terme, score)"
+EXPORT_NPZ = "Matrice creuse (.npz)"
+
+# Nombre de documents exportés à la fois au format long
+TAILLE_BLOC_EXPORT = 5000
+
+# Modes de calcul du TF-IDF
+CALCUL_COMPLET = "Complet (tout le corpus est recalculé)"
+CALCUL_INCREMENTAL = "Incrémental (seuls les nouveaux documents sont comptés et scorés)"
+
+# Nombre maximal de mots affichés par WordCloud (valeur par défaut de max_words)
+MOTS_NUAGE = 200
+
+
+# Fonction pour trouver le terme de score maximal de chaque document sans densifier la matrice
+def top_termes_documents(tfidf_matrix, feature_names):
+    tfidf_matrix = tfidf_matrix.tocsr()
+    indices = np.asarray(tfidf_matrix.argmax(axis=1)).ravel()
+    scores = tfidf_matrix.max(axis=1).toarray().ravel()
+    # Un document vide (aucun terme retenu) n'a pas de terme principal
+    vides = np.diff(tfidf_matrix.indptr) == 0
+    termes = np.where(vides, "", feature_names[indices])
+    return termes, scores
+
+
+# Fonction pour exporter les scores non nuls au format long, bloc de documents par bloc de documents
+def exporter_scores_long(tfidf_matrix, feature_names, chemin, taille_bloc=TAILLE_BLOC_EXPORT):
+    tfidf_matrix = tfidf_matrix.tocsr()
+    with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+        for debut in range(0, tfidf_matrix.shape[0], taille_bloc):
+            bloc = tfidf_matrix[debut:debut + taille_bloc].tocoo()
+            pd.DataFrame({
+                'Document Number': bloc.row + debut + 1,
+                'Term': feature_names[bloc.col],
+                'TF-IDF Score': bloc.data,
+            }).to_csv(fichier, index=False, header=(debut == 0))
+
+
+# Fonction pour exporter la matrice creuse et son vocabulaire
+def exporter_scores_npz(tfidf_matrix, feature_names, save_directory):
+    chemin_matrice = os.path.join(save_directory, "scores_tfidf.npz")
+    sparse.save_npz(chemin_matrice, tfidf_matrix.tocsr())
+    pd.DataFrame({'Term': feature_names}).to_csv(os.path.join(save_directory, "vocabulaire_tfidf.csv"),
+                                                index_label='Column')
+    return chemin_matrice
+
+
+# Fonction pour ne garder que les termes de plus fort poids (seuls ceux-ci apparaissent dans un nuage de mots)
+def termes_principaux(feature_names, poids, nombre):
+    nombre = min(nombre, np.count_nonzero(poids))
+    if nombre == 0:
+        return feature_names[:0], poids[:0]
+    indices = np.argpartition(poids, -nombre)[-nombre:]
+    indices = indices[np.argsort(poids[indices])[::-1]]
+    return feature_names[indices], poids[indices]
+
+
+# Génération et affichage de nuages de mots
+def generate_wordcloud(words, title, file_path):
+    wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(words)
+    plt.figure(figsize=(10, 5))
+    plt.imshow(wordcloud, interpolation='bilinear')
+    plt.axis('off')
+    plt.title(title)
+    plt.savefig(file_path)
+    st.pyplot(plt)
+
+
 # Interface principale pour Streamlit
 def afficher_interface_tfidf():
     st.title("Analyse TF-IDF des Documents Textuels")
@@ -58,30 +128,57 @@ def afficher_interface_tfidf():
     uploaded_file = st.file_uploader("Téléchargez un fichier texte pour TF-IDF", type="txt")
 
     if uploaded_file is not None:
-        # Extension des stopwords
-        spacy_stopwords = set(nlp.Defaults.stop_words)
+        # Extension des stopwords (liste SpaCy, sans charger le modèle)
+        spacy_stopwords = set(STOP_WORDS)
         custom_stopwords = st.text_area("Entrez des stopwords personnalisés (séparés par une virgule):", value="")
         if custom_stopwords:
             spacy_stopwords.update(custom_stopwords.split(','))
 
+        # Taille des lots et nombre de processus pour l'annotation SpaCy
+        batch_size, n_process = parametres_annotation()
+
+        save_directory = st.text_input("Définir le répertoire de sauvegarde",
+                                       value=os.path.expanduser("~/Documents/ATA/TFIDF"))
+
+        # Choix du calcul des scores TF-IDF
+        normalisation = st.selectbox("Choisissez la méthode de normalisation pour TF-IDF:", ["Aucune", "L2"])
+
+        # Choisir le nombre de termes à exporter
+        top_n = st.slider("Choisissez le nombre de termes à exporter:", min_value=5, max_value=100, value=20)
+        format_scores = st.radio("Format d'export des scores TF-IDF", [EXPORT_LONG, EXPORT_NPZ])
+
+        # Mode incrémental : les fréquences documentaires du corpus sont conservées entre deux exports
+        calcul = st.radio("Mode de calcul", [CALCUL_COMPLET, CALCUL_INCREMENTAL])
+        recalculer = False
+        if calcul == CALCUL_INCREMENTAL:
+            nom_corpus = st.text_input("Nom du corpus suivi", value="corpus")
+            hachage = st.checkbox("Vocabulaire haché (mémoire bornée)", value=False)
+            n_features = NOMBRE_COLONNES_HACHAGE
+            if hachage:
+                n_features = 2 ** st.slider("Nombre de colonnes du vocabulaire haché (puissance de 2)", 12, 24, 18)
+            recalculer = st.button("Recalculer tout (repartir de ce fichier)")
+
         # Bouton pour lancer l'analyse
-        if st.button("Lancer l'Analyse TF-IDF"):
+        if st.button("Lancer l'Analyse TF-IDF") or recalculer:
+            if recalculer:
+                reinitialiser_etat(nom_corpus)
+
             # Chargement et préparation du fichier texte
             content = uploaded_file.getvalue().decode("utf-8")
             content = re.sub(r'\n+', '\n', content).strip()
             messages = content.split('\n#')
             st.write(f"Nombre initial de messages divisés : {len(messages)}")
 
-            # Lemmatisation et suppression des stopwords
-            corpus_lemmatized_and_cleaned = [
-                lemmatize_and_remove_stopwords(msg, nlp, spacy_stopwords) for msg in messages if msg.strip()
-            ]
+            # Lemmatisation par lots et suppression des stopwords
+            messages = [msg for msg in messages if msg.strip()]
+            annotations = annoter_avec_cache(messages, charger_nlp, batch_size=batch_size, n_process=n_process,
+                                             progression=progression_streamlit(len(messages)))
+            corpus_lemmatized_and_cleaned = [lemmatiser_annotation(annotation, spacy_stopwords)
+                                             for annotation in annotations]
             st.write(f"Nombre de documents après traitement : {len(corpus_lemmatized_and_cleaned)}")
 
             # Exportation au format CSV du corpus lemmatisé/stopword
             df_corpus_cleaned = pd.DataFrame(corpus_lemmatized_and_cleaned, columns=['Document Text'])
-            save_directory = st.text_input("Définir le répertoire de sauvegarde",
-                                           value=os.path.expanduser("~/Documents/ATA/TFIDF"))
             if not os.path.exists(save_directory):
                 os.makedirs(save_directory)
             csv_output_path = os.path.join(save_directory, "corpus_lemmatised_and_cleaned.csv")
@@ -91,61 +188,74 @@ def afficher_interface_tfidf():
             # Lecture du fichier CSV contenant le corpus lemmatisé et nettoyé
             corpus_from_csv = df_corpus_cleaned['Document Text'].tolist()
 
-            # Choix du calcul des scores TF-IDF
-            normalisation = st.selectbox("Choisissez la méthode de normalisation pour TF-IDF:", ["Aucune", "L2"])
+            # Calcul des scores TF-IDF (la matrice reste creuse sur toute la page)
             norm = 'l2' if normalisation == "L2" else None
-            tfidf_vectorizer = TfidfVectorizer(norm=norm, use_idf=True)
-            tfidf_matrix_from_csv = tfidf_vectorizer.fit_transform(corpus_from_csv)
-            feature_names_from_csv = tfidf_vectorizer.get_feature_names_out()
-
-            # Création d'un DataFrame pour les scores TF-IDF
-            tfidf_df_from_csv = pd.DataFrame(tfidf_matrix_from_csv.toarray(), columns=feature_names_from_csv)
-            tfidf_df_from_csv['Document Number'] = range(1, len(tfidf_df_from_csv) + 1)
-            tfidf_df_from_csv['Top TF-IDF Term'] = tfidf_df_from_csv[feature_names_from_csv].idxmax(axis=1)
-
-            # Exportation des scores TF-IDF dans un fichier CSV
-            csv_path_scores = os.path.join(save_directory, "resultats_doc_final.csv")
-            tfidf_df_from_csv.to_csv(csv_path_scores, index=False)
-            st.success(f"Les scores TF-IDF pour chaque document ont été sauvegardés dans {csv_path_scores}")
-
-            # Choisir le nombre de termes à exporter
-            top_n = st.slider("Choisissez le nombre de termes à exporter:", min_value=5, max_value=100, value=20)
-            top_scores = tfidf_df_from_csv[feature_names_from_csv].max().nlargest(top_n)
-
-            # Exportation du top N des scores TF-IDF dans un fichier CSV
-            top_n_terms = pd.DataFrame({'Term': top_scores.index, 'TF-IDF Score': top_scores.values})
-            csv_path_top_n = os.path.join(save_directory, f"top_{top_n}_terms_final.csv")
-            top_n_terms.to_csv(csv_path_top_n, index=False)
-            st.success(
-                f"Les {top_n} termes les plus importants basés sur les scores TF-IDF ont été sauvegardés dans {csv_path_top_n}")
-
-            # Génération et affichage de nuages de mots
-            def generate_wordcloud(words, title, file_path):
-                wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(words)
-                plt.figure(figsize=(10, 5))
-                plt.imshow(wordcloud, interpolation='bilinear')
-                plt.axis('off')
-                plt.title(title)
-                plt.savefig(file_path)
-                st.pyplot(plt)
-
-            # Nuage de mots pour tous les termes
-            generate_wordcloud(dict(zip(feature_names_from_csv, np.mean(tfidf_matrix_from_csv.toarray(), axis=0))),
-                               "Global TF-IDF", os.path.join(save_directory, "global_tfidf_final.png"))
-
-            # Nuage de mots pour le top N des termes
-            generate_wordcloud(top_n_terms.set_index('Term')['TF-IDF Score'].to_dict(),
-                               f"Top {top_n} TF-IDF Terms", os.path.join(save_directory, f"top{top_n}_tfidf_final.png"))
-
-            # Loi de Zipf à partir des résultats TF-IDF
-            tfidf_sum = np.array(tfidf_matrix_from_csv.sum(axis=0)).flatten()
-            sorted_tfidf_sum = np.sort(tfidf_sum)[::-1]  # Trier les scores TF-IDF en ordre décroissant
-            ranks = np.arange(1, len(sorted_tfidf_sum) + 1)  # Créer un tableau de rangs
-            plt.figure(figsize=(10, 6))
-            plt.loglog(ranks, sorted_tfidf_sum, marker="o")
-            plt.title("Loi de Zipf - Fréquence des termes vs Rang")
-            plt.xlabel("Rang du terme")
-            plt.ylabel("Fréquence (Somme des scores TF-IDF)")
-            st.pyplot(plt)
+            if calcul == CALCUL_INCREMENTAL:
+                mode = MODE_HACHAGE if hachage else MODE_VOCABULAIRE
+                tfidf_matrix_from_csv, feature_names_from_csv, nombre_deja_comptes = ajouter_documents(
+                    corpus_from_csv, nom_corpus, mode, n_features, norm)
+                st.write(f"Documents scorés : {tfidf_matrix_from_csv.shape[0]} - déjà comptés dans les fréquences "
+                         f"documentaires d'un lot précédent : {nombre_deja_comptes}")
+            else:
+                tfidf_vectorizer = TfidfVectorizer(norm=norm, use_idf=True)
+                tfidf_matrix_from_csv = tfidf_vectorizer.fit_transform(corpus_from_csv)
+                feature_names_from_csv = tfidf_vectorizer.get_feature_names_out()
+
+            afficher_resultats_tfidf(tfidf_matrix_from_csv, feature_names_from_csv, save_directory, top_n,
+                                     format_scores)
+
+
+# Fonction pour exporter et afficher les résultats TF-IDF (termes principaux, nuages de mots, loi de Zipf)
+def afficher_resultats_tfidf(tfidf_matrix, feature_names, save_directory, top_n, format_scores):
+    # Terme principal de chaque document
+    top_terms, top_term_scores = top_termes_documents(tfidf_matrix, feature_names)
+    df_top_terms = pd.DataFrame({
+        'Document Number': range(1, len(top_terms) + 1),
+        'Top TF-IDF Term': top_terms,
+        'Top TF-IDF Score': top_term_scores,
+    })
+    csv_path_top_terms = os.path.join(save_directory, "resultats_doc_final.csv")
+    df_top_terms.to_csv(csv_path_top_terms, index=False)
+    st.success(f"Le terme principal de chaque document a été sauvegardé dans {csv_path_top_terms}")
+
+    # Exportation des scores TF-IDF non nuls
+    if format_scores == EXPORT_NPZ:
+        csv_path_scores = exporter_scores_npz(tfidf_matrix, feature_names, save_directory)
+    else:
+        csv_path_scores = os.path.join(save_directory, "scores_tfidf_long.csv")
+        exporter_scores_long(tfidf_matrix, feature_names, csv_path_scores)
+    st.success(f"Les scores TF-IDF pour chaque document ont été sauvegardés dans {csv_path_scores}")
+
+    # Score maximal de chaque terme sur l'ensemble des documents
+    max_scores = tfidf_matrix.max(axis=0).toarray().ravel()
+    top_terms_n, top_scores_n = termes_principaux(feature_names, max_scores, top_n)
+
+    # Exportation du top N des scores TF-IDF dans un fichier CSV
+    top_n_terms = pd.DataFrame({'Term': top_terms_n, 'TF-IDF Score': top_scores_n})
+    csv_path_top_n = os.path.join(save_directory, f"top_{top_n}_terms_final.csv")
+    top_n_terms.to_csv(csv_path_top_n, index=False)
+    st.success(
+        f"Les {top_n} termes les plus importants basés sur les scores TF-IDF ont été sauvegardés dans {csv_path_top_n}")
+
+    # Nuage de mots pour tous les termes (score moyen par terme)
+    mean_scores = np.asarray(tfidf_matrix.mean(axis=0)).ravel()
+    global_terms, global_scores = termes_principaux(feature_names, mean_scores, MOTS_NUAGE)
+    generate_wordcloud(dict(zip(global_terms, global_scores)),
+                       "Global TF-IDF", os.path.join(save_directory, "global_tfidf_final.png"))
+
+    # Nuage de mots pour le top N des termes
+    generate_wordcloud(top_n_terms.set_index('Term')['TF-IDF Score'].to_dict(),
+                       f"Top {top_n} TF-IDF Terms", os.path.join(save_directory, f"top{top_n}_tfidf_final.png"))
+
+    # Loi de Zipf à partir des résultats TF-IDF
+    tfidf_sum = np.asarray(tfidf_matrix.sum(axis=0)).ravel()
+    sorted_tfidf_sum = np.sort(tfidf_sum[tfidf_sum > 0])[::-1]  # Trier les scores TF-IDF en ordre décroissant
+    ranks = np.arange(1, len(sorted_tfidf_sum) + 1)  # Créer un tableau de rangs
+    plt.figure(figsize=(10, 6))
+    plt.loglog(ranks, sorted_tfidf_sum, marker="o")
+    plt.title("Loi de Zipf - Fréquence des termes vs Rang")
+    plt.xlabel("Rang du terme")
+    plt.ylabel("Fréquence (Somme des scores TF-IDF)")
+    st.pyplot(plt)
 
 
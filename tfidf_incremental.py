@@ -0,0 +1,167 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import json
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.preprocessing import normalize
+from cache_disque import ecrire_atomique, repertoire_cache, hacher_texte
+
+# Modes de vocabulaire du TF-IDF incrémental
+MODE_VOCABULAIRE = "vocabulaire"
+MODE_HACHAGE = "hachage"
+
+# Nombre de colonnes par défaut du vocabulaire haché
+NOMBRE_COLONNES_HACHAGE = 2 ** 18
+
+# Fichiers de l'état persistant d'un corpus :
+# etat.json (mode, nombre de documents), df.npy (fréquences documentaires), vocabulaire.json (termes par colonne),
+# empreintes.txt (une empreinte de document déjà compté par ligne)
+FICHIER_ETAT = "etat.json"
+FICHIER_DF = "df.npy"
+FICHIER_VOCABULAIRE = "vocabulaire.json"
+FICHIER_EMPREINTES = "empreintes.txt"
+
+# Même découpage en termes que TfidfVectorizer (mode complet)
+analyser = CountVectorizer().build_analyzer()
+
+
+# Fonction pour obtenir le répertoire de l'état incrémental d'un corpus
+def repertoire_tfidf(nom_corpus):
+    return repertoire_cache('tfidf', nom_corpus)
+
+
+# Fonction pour relire l'état d'un corpus (None si aucun document n'a encore été compté)
+def charger_etat(repertoire):
+    chemin = os.path.join(repertoire, FICHIER_ETAT)
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, 'r', encoding='utf-8') as fichier:
+        etat = json.load(fichier)
+    etat['df'] = np.load(os.path.join(repertoire, FICHIER_DF))
+    etat['vocabulaire'] = {}
+    if etat['mode'] == MODE_VOCABULAIRE:
+        with open(os.path.join(repertoire, FICHIER_VOCABULAIRE), 'r', encoding='utf-8') as fichier:
+            etat['vocabulaire'] = {terme: colonne for colonne, terme in enumerate(json.load(fichier))}
+    with open(os.path.join(repertoire, FICHIER_EMPREINTES), 'r', encoding='ascii') as fichier:
+        etat['empreintes'] = set(fichier.read().split())
+    return etat
+
+
+# Fonction pour créer l'état vide d'un corpus
+def nouvel_etat(mode=MODE_VOCABULAIRE, n_features=NOMBRE_COLONNES_HACHAGE):
+    return {
+        'mode': mode,
+        'n_features': n_features if mode == MODE_HACHAGE else 0,
+        'nombre_documents': 0,
+        'df': np.zeros(n_features if mode == MODE_HACHAGE else 0, dtype=np.int64),
+        'vocabulaire': {},
+        'empreintes': set(),
+    }
+
+
+# Fonction pour enregistrer l'état ; les empreintes des nouveaux documents sont ajoutées en fin de fichier
+def enregistrer_etat(repertoire, etat, nouvelles_empreintes):
+    np.save(os.path.join(repertoire, FICHIER_DF), etat['df'])
+    if etat['mode'] == MODE_VOCABULAIRE:
+        termes = sorted(etat['vocabulaire'], key=etat['vocabulaire'].get)
+        ecrire_atomique(os.path.join(repertoire, FICHIER_VOCABULAIRE),
+                        lambda fichier: fichier.write(json.dumps(termes, ensure_ascii=False).encode('utf-8')))
+    with open(os.path.join(repertoire, FICHIER_EMPREINTES), 'a', encoding='ascii') as fichier:
+        fichier.writelines(f"{empreinte}\n" for empreinte in nouvelles_empreintes)
+    # L'état est écrit en dernier : il valide les autres fichiers
+    meta = {cle: etat[cle] for cle in ('mode', 'n_features', 'nombre_documents')}
+    ecrire_atomique(os.path.join(repertoire, FICHIER_ETAT),
+                    lambda fichier: fichier.write(json.dumps(meta).encode('utf-8')))
+
+
+# Fonction pour effacer l'état d'un corpus (recalcul complet)
+def reinitialiser_etat(nom_corpus):
+    shutil.rmtree(repertoire_tfidf(nom_corpus), ignore_errors=True)
+
+
+# Fonction pour compter les termes de documents avec un vocabulaire qui s'agrandit au fil des lots
+def compter_vocabulaire(textes, vocabulaire):
+    indices = []
+    indptr = [0]
+    donnees = []
+    for texte in textes:
+        comptes = {}
+        for terme in analyser(texte):
+            colonne = vocabulaire.setdefault(terme, len(vocabulaire))
+            comptes[colonne] = comptes.get(colonne, 0) + 1
+        indices.extend(comptes)
+        donnees.extend(comptes.values())
+        indptr.append(len(indices))
+    return sparse.csr_matrix((np.array(donnees, dtype=np.float64), np.array(indices, dtype=np.int64), indptr),
+                             shape=(len(textes), len(vocabulaire)))
+
+
+# Fonction pour créer le vectoriseur du mode haché (comptes bruts, sans signe ni normalisation)
+def vectoriseur_hachage(n_features):
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+
+
+# Fonction pour retrouver les termes des colonnes hachées à partir des termes d'un lot
+# (les termes qui partagent une colonne sont joints par « | »)
+def noms_colonnes_hachage(textes, n_features):
+    termes = sorted({terme for texte in textes for terme in analyser(texte)})
+    noms = np.full(n_features, "", dtype=object)
+    if termes:
+        colonnes = vectoriseur_hachage(n_features).transform(termes).indices
+        for colonne, terme in zip(colonnes, termes):
+            noms[colonne] = f"{noms[colonne]}|{terme}" if noms[colonne] else terme
+    return noms
+
+
+# Fonction pour calculer les scores TF-IDF à partir des comptes (même pondération que TfidfVectorizer)
+def ponderer(comptes, df, nombre_documents, norm='l2'):
+    idf = np.log((1 + nombre_documents) / (1 + df[:comptes.shape[1]])) + 1
+    scores = comptes.multiply(idf).tocsr()
+    return normalize(scores, norm=norm) if norm else scores
+
+
+# Fonction pour ajouter un lot de documents à un corpus et scorer tous les documents du lot
+# Les documents déjà comptés dans un lot précédent sont scorés mais ne modifient pas les fréquences documentaires ;
+# les doublons d'un même lot comptent chacun, comme avec TfidfVectorizer
+# Renvoie la matrice TF-IDF du lot (une ligne par texte, dans l'ordre), les noms des colonnes
+# et le nombre de documents déjà comptés
+def ajouter_documents(textes, nom_corpus, mode=MODE_VOCABULAIRE, n_features=NOMBRE_COLONNES_HACHAGE, norm='l2'):
+    repertoire = repertoire_tfidf(nom_corpus)
+    etat = charger_etat(repertoire)
+    if etat is None or etat['mode'] != mode or (mode == MODE_HACHAGE and etat['n_features'] != n_features):
+        reinitialiser_etat(nom_corpus)
+        repertoire = repertoire_tfidf(nom_corpus)
+        etat = nouvel_etat(mode, n_features)
+
+    empreintes = [hacher_texte(texte) for texte in textes]
+    nouveaux = np.array([empreinte not in etat['empreintes'] for empreinte in empreintes], dtype=bool)
+    nombre_deja_comptes = int(len(textes) - nouveaux.sum())
+
+    if mode == MODE_HACHAGE:
+        comptes = vectoriseur_hachage(n_features).transform(textes).tocsr()
+        feature_names = noms_colonnes_hachage(textes, n_features)
+    else:
+        comptes = compter_vocabulaire(textes, etat['vocabulaire'])
+        feature_names = np.array(sorted(etat['vocabulaire'], key=etat['vocabulaire'].get), dtype=object)
+        etat['df'] = np.concatenate([etat['df'], np.zeros(comptes.shape[1] - len(etat['df']), dtype=np.int64)])
+
+    # Mise à jour des fréquences documentaires : un terme compte une fois par nouveau document
+    etat['df'] += np.bincount(comptes[nouveaux].indices, minlength=len(etat['df']))
+    etat['nombre_documents'] += int(nouveaux.sum())
+    empreintes_nouvelles = list(dict.fromkeys(e for e, nouveau in zip(empreintes, nouveaux) if nouveau))
+    etat['empreintes'].update(empreintes_nouvelles)
+    enregistrer_etat(repertoire, etat, empreintes_nouvelles)
+
+    return ponderer(comptes, etat['df'], etat['nombre_documents'], norm), feature_names, nombre_deja_comptes
@@ -0,0 +1,100 @@
+##########################################
+# Projet : Analyse Textuelle Avancée (ATA)
+# Auteur : Stéphane Meurisse
+# Contact : stephane.meurisse@gmail.com
+# Site Web : https://www.codeandcortex.fr
+# LinkedIn : https://www.linkedin.com/in/st%C3%A9phane-meurisse-27339055/
+# Date : 22 août 2024
+# Version : 0.1.0-beta
+# Licence : Ce programme est un logiciel libre : vous pouvez le redistribuer selon les termes de la Licence Publique Générale GNU v3
+##########################################
+
+import re
+import sys
+import time
+from collections import Counter
+import numpy as np
+
+# Mots dont l'apostrophe fait partie du mot (et non une élision) : ils restent un seul token
+FORMES_APOSTROPHE = [r"aujourd'hui", r"quelqu'une?s?", r"presqu'îles?", r"prud'hom\w*", r"entr'actes?",
+                     r"grand'(?:mère|messe|rue|route)s?"]
+
+# Élisions françaises (l', d', qu', jusqu'...) : elles sont retirées et le mot qui suit devient un token ;
+# sinon un token est un mot de FORMES_APOSTROPHE ou une suite de lettres ou de chiffres
+# (les apostrophes typographiques sont ramenées à l'apostrophe droite avant le découpage)
+MOTIF_TOKEN = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu|quoiqu)'|(\b(?:"
+                         + "|".join(FORMES_APOSTROPHE) + r")\b|[^\W_]+)")
+MOTIF_ESPACES = re.compile(r'\s+')
+
+
+# Fonction pour normaliser un texte avant l'encodage des phrases (minuscules, espaces simples)
+def normaliser_texte(texte):
+    return MOTIF_ESPACES.sub(' ', texte.lower())
+
+
+# Fonction pour découper un texte en tokens en minuscules, sans les mots exclus
+# stopwords : frozenset de mots en minuscules
+def tokeniser(texte, stopwords=frozenset()):
+    return [token for token in MOTIF_TOKEN.findall(texte.lower().replace('’', "'"))
+            if token and token not in stopwords]
+
+
+# Fonction pour encoder un lot de textes en identifiants entiers
+# vocabulaire : dictionnaire terme -> identifiant, partagé entre les lots et complété sur place
+# Renvoie les identifiants des tokens (textes mis bout à bout) et la position du premier token de chaque texte
+def encoder_textes(textes, vocabulaire, stopwords=frozenset()):
+    identifiants = []
+    bornes = [0]
+    for texte in textes:
+        identifiants.extend(vocabulaire.setdefault(token, len(vocabulaire)) for token in tokeniser(texte, stopwords))
+        bornes.append(len(identifiants))
+    return np.array(identifiants, dtype=np.int32), np.array(bornes, dtype=np.int64)
+
+
+# Fonction pour compter les termes d'un ensemble de textes (pour WordCloud.generate_from_frequencies)
+def frequences_termes(textes, stopwords=frozenset()):
+    frequences = Counter()
+    for texte in textes:
+        frequences.update(tokeniser(texte, stopwords))
+    return frequences
+
+
+# Fonction pour comparer la tokenisation avec celle de NLTK (word_tokenize puis tokens alphanumériques)
+# sur un corpus : durées, accélération et part des tokens identiques
+def comparer_nltk(chemin_corpus):
+    import nltk
+    from nltk.corpus import stopwords as nltk_stopwords
+    from nltk.tokenize import word_tokenize
+    from corpus import lire_corpus
+
+    nltk.download('punkt_tab', quiet=True)
+    nltk.download('stopwords', quiet=True)
+    stopwords = frozenset(nltk_stopwords.words('french'))
+    textes = [article['texte'] for article in lire_corpus(chemin_corpus)]
+
+    debut = time.perf_counter()
+    tokens_nltk = [[token.lower() for token in word_tokenize(texte, language='french')
+                    if token.lower().isalnum() and token.lower() not in stopwords] for texte in textes]
+    duree_nltk = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    tokens_ata = [tokeniser(texte, stopwords) for texte in textes]
+    duree_ata = time.perf_counter() - debut
+
+    # Écarts attendus : NLTK écarte les mots élidés (« l'homme ») et composés (« peut-être ») que MOTIF_TOKEN
+    # découpe, ainsi que les mots de FORMES_APOSTROPHE, gardés entiers ici. Sans mots exclus :
+    # tokeniser("Aujourd'hui, quelqu'un l'a vu sur la presqu'île")
+    # -> ["aujourd'hui", "quelqu'un", 'a', 'vu', 'sur', 'la', "presqu'île"]
+    communs = sum(sum((Counter(a) & Counter(b)).values()) for a, b in zip(tokens_nltk, tokens_ata))
+    total = max(sum(len(tokens) for tokens in tokens_nltk), 1)
+    print(f"{len(textes)} documents")
+    print(f"NLTK word_tokenize : {duree_nltk:.2f} s")
+    print(f"tokenisation ATA   : {duree_ata:.2f} s (x{duree_nltk / max(duree_ata, 1e-9):.1f})")
+    print(f"tokens NLTK retrouvés : {communs / total:.2%}")
+    print(f"tokens supplémentaires (élisions, mots composés) : "
+          f"{sum(len(tokens) for tokens in tokens_ata) - communs}")
+
+
+# Comparaison avec NLTK : python tokenisation.py corpus.txt
+if __name__ == "__main__":
+    comparer_nltk(sys.argv[1])